@@ -0,0 +1,123 @@
+import math
+import os
+import numpy as np
+from ai.face_align import anchor_points, chip_scale
+from ai.image_container import as_frame
+
+# Rough CPU costs in ms, measured with `benchmark.py budget --calibrate` on a
+# single core. PP_COST_SCALE scales them all for slower/faster hosts.
+COST_SCALE = float(os.environ.get("PP_COST_SCALE", "1.0"))
+FRAME_MS_PER_MP = 35.0     # full-frame copy, render and diff in the gaze/smile nodes
+ALIGN_MS = 1.0             # per face and edit: alignment + write-back at canonical size
+# ALIGN_MS, GAZE_MS and SMILE_MS are at canonical chip size; bigger faces
+# get bigger chips and cost chip_scale ** 2 times as much
+WRITEBACK_MS = 0.3         # per face and edit, times (eye distance / 64) ** 2
+GAZE_MS = {"telea": 1.0, "fast": 0.3}
+SMILE_MS = {"seamless": 2.0, "feather": 0.2}
+CHAT_MS_PER_MP = 60.0      # apply_chat_edits with every adjustment active
+PREVIEW_MS_PER_MP = 12.0   # INTER_AREA downscale, per source megapixel
+
+MARGIN = 0.85              # plan to this fraction of what's left of the budget
+TINY_FACE = 16             # eye distance (px) below which edits are barely visible
+MIN_CHAT_SIDE = 640
+
+FULL_QUALITY = {"skip_faces": (), "iris_fill": "telea", "smile_blend": "seamless"}
+
+
+class Plan:
+    def __init__(self, params, estimate_ms, budget_ms, degradations):
+        self.params = params
+        self.estimate_ms = estimate_ms
+        self.budget_ms = budget_ms
+        self.degradations = degradations
+
+    def __repr__(self):
+        return f"Plan(estimate={self.estimate_ms:.0f}ms, budget={self.budget_ms:.0f}ms, {self.degradations})"
+
+
+def face_size(landmarks):
+    """Eye distance in pixels."""
+    eyes = anchor_points(landmarks)
+    return float(np.linalg.norm(eyes[1] - eyes[0]))
+
+
+def estimate_ms(shape, sizes, params):
+    """
+    shape: image shape, sizes: eye distance per face
+    Output: expected ms for the gaze + smile nodes with these params
+    """
+    edited = [s for i, s in enumerate(sizes) if i not in params["skip_faces"]]
+    if not edited:
+        return 0.0  # the nodes return without touching the frame
+    mp = shape[0] * shape[1] / 1e6
+    ms = FRAME_MS_PER_MP * mp
+    per_face = 2 * ALIGN_MS + GAZE_MS[params["iris_fill"]] + SMILE_MS[params["smile_blend"]]
+    for size in edited:
+        ms += per_face * chip_scale(size) ** 2 + 2 * WRITEBACK_MS * (size / 64.0) ** 2
+    return ms * COST_SCALE
+
+
+def plan(shape, faces, budget_ms):
+    """
+    Picks the cheapest-looking degradations that fit the Studio edits into
+    budget_ms (what is left after decoding and landmarks), in this order:
+    skip tiny faces, fast iris fill, feathered smile blend, then skip the
+    smallest remaining faces one by one.
+    Output: Plan (params for the gaze/smile nodes + human-readable degradations)
+    """
+    sizes = [face_size(f) for f in faces]
+    params = dict(FULL_QUALITY)
+    target = budget_ms * MARGIN
+    degradations = []
+
+    def fits():
+        return estimate_ms(shape, sizes, params) <= target
+
+    if not fits():
+        tiny = tuple(i for i, s in enumerate(sizes) if s < TINY_FACE)
+        if tiny:
+            params["skip_faces"] = tiny
+            degradations.append(f"skipped {len(tiny)} tiny face(s)")
+    if not fits():
+        params["iris_fill"] = "fast"
+        degradations.append("fast iris fill")
+    if not fits():
+        params["smile_blend"] = "feather"
+        degradations.append("feathered smile blend")
+    if not fits():
+        skipped = 0
+        for i in sorted(range(len(sizes)), key=lambda i: sizes[i]):
+            if fits():
+                break
+            if i not in params["skip_faces"]:
+                params["skip_faces"] = tuple(sorted(params["skip_faces"] + (i,)))
+                skipped += 1
+        if skipped:
+            degradations.append(f"skipped {skipped} more face(s), smallest first")
+    if sizes and len(params["skip_faces"]) == len(sizes):
+        # The cheaper variants don't matter once no face is edited
+        degradations = [f"skipped all {len(sizes)} face(s)"]
+    estimate = estimate_ms(shape, sizes, params)
+    if estimate > target or budget_ms <= 0:
+        degradations.append("over budget: landmarks alone used it up" if budget_ms <= 0
+                            else f"over budget: needs ~{estimate:.0f} ms")
+    return Plan(params, estimate, budget_ms, degradations)
+
+
+def chat_edit_input(image, budget_ms):
+    """
+    Input: image for apply_chat_edits (ndarray or Frame), budget in ms (None = no limit)
+    Output: (BGR image to edit, degradations); a downscaled preview when the
+    full-resolution edit would not fit.
+    """
+    frame = as_frame(image)
+    h, w = frame.shape[:2]
+    mp = h * w / 1e6
+    if budget_ms is None or CHAT_MS_PER_MP * COST_SCALE * mp <= budget_ms * MARGIN:
+        return frame.bgr(), []
+
+    # The downscale itself isn't free
+    fit_mp = (budget_ms * MARGIN / COST_SCALE - PREVIEW_MS_PER_MP * mp) / CHAT_MS_PER_MP
+    max_side = max(MIN_CHAT_SIDE, int(max(h, w) * math.sqrt(max(fit_mp, 0.0) / mp)))
+    preview = frame.preview(max_side=max_side, order="BGR")
+    return preview, [f"chat edits at {preview.shape[1]}x{preview.shape[0]} preview"]
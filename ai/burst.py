@@ -0,0 +1,219 @@
+import cv2
+import numpy as np
+from ai.compositing import blend
+from ai.face_align import anchor_points, edit_aligned
+from ai.landmark_backends import get_backend
+from ai.gaze_correction import correct_gaze
+from ai.image_container import as_bgr
+from ai.patches import PatchedImage
+from ai.profiling import stage
+from ai.smile_warp import warp_smile
+from ai.studio import landmark_backend
+
+# MediaPipe Face Mesh indices, same points as calculate_ear / warp_eye / warp_smile.
+# EAR: (upper, lower, upper, lower, corner, corner) per eye
+EAR_POINTS = np.array([[159, 145, 158, 153, 33, 133],
+                       [386, 374, 387, 373, 362, 263]])
+# (corner, corner, iris center) per eye
+EYE_POINTS = np.array([[33, 133, 468],
+                       [362, 263, 473]])
+MOUTH_CORNERS = [61, 291]
+LIP_MID = [0, 17]
+
+EAR_CLOSED = 0.2   # warp_eye leaves eyes below this alone
+EAR_OPEN = 0.3
+GAZE_OK = 0.08     # iris offset from the eye center, as a fraction of eye width
+SMILE_OK = 0.05    # mouth-corner lift, as a fraction of eye distance
+
+# Closed eyes can't be fixed afterwards, gaze and smile can: openness dominates
+W_OPEN = 3.0
+W_GAZE = 2.0
+W_SMILE = 4.0
+KEEP_MARGIN = 0.1  # only swap in a face from another frame if it scores clearly better
+
+MATCH_DIST = 0.75  # max face-center shift between frames, in eye distances
+
+
+def score_faces(faces):
+    """
+    Input: list of 478-point faces (from any number of frames)
+    Output: dict of float arrays with one entry per face:
+    ear (worse eye), gaze (iris offset), lift (mouth corners), score
+    All faces are scored in one batch of array ops.
+    """
+    n = len(faces)
+    if n == 0:
+        empty = np.zeros(0, np.float32)
+        return {"ear": empty, "gaze": empty, "lift": empty, "score": empty}
+
+    # Eye aspect ratio, both eyes at once: (faces, eye, 3 distances)
+    ear_pts = _points(faces, EAR_POINTS)
+    d = np.linalg.norm(ear_pts[:, :, 0::2] - ear_pts[:, :, 1::2], axis=-1)
+    ear = ((d[..., 0] + d[..., 1]) / (2.0 * np.maximum(d[..., 2], 1e-6))).min(axis=1)
+
+    corners = _points(faces, EYE_POINTS[:, :2])  # (faces, eye, corner, 2)
+    eyes = corners.mean(axis=2)
+    if all(len(face) > EYE_POINTS.max() for face in faces):
+        width = np.maximum(np.linalg.norm(corners[:, :, 0] - corners[:, :, 1], axis=-1), 1e-6)
+        iris = _points(faces, EYE_POINTS[:, 2])
+        gaze = (np.linalg.norm(iris - eyes, axis=-1) / width).mean(axis=1)
+    else:
+        gaze = np.zeros(n, np.float32)  # no iris points (unrefined mesh)
+
+    # Corner lift along the face's "up" (perpendicular to the eye line), so
+    # head roll doesn't count as smiling
+    across = eyes[:, 1] - eyes[:, 0]
+    up = np.stack([across[:, 1], -across[:, 0]], axis=1)
+    offset = _points(faces, MOUTH_CORNERS).mean(axis=1) - _points(faces, LIP_MID).mean(axis=1)
+    lift = (offset * up).sum(axis=1) / np.maximum((across ** 2).sum(axis=1), 1e-6)
+
+    openness = np.clip((ear - EAR_CLOSED) / (EAR_OPEN - EAR_CLOSED), 0.0, 1.0)
+    score = W_OPEN * openness - W_GAZE * gaze + W_SMILE * lift
+    return {"ear": ear, "gaze": gaze, "lift": lift, "score": score}
+
+
+def _points(faces, indices):
+    """Output: float32 array (faces, *indices.shape, 2) of just these landmarks."""
+    # Converting all 478 tuples per face would cost more than the scoring itself
+    indices = np.asarray(indices)
+    flat = indices.ravel().tolist()
+    pts = np.asarray([[face[i] for i in flat] for face in faces], dtype=np.float32)
+    return pts.reshape(len(faces), *indices.shape, 2)
+
+
+def _centers(faces):
+    """Output: (face centers, eye distances) as arrays."""
+    if not faces:
+        return np.zeros((0, 2), np.float32), np.zeros(0, np.float32)
+    anchors = np.stack([anchor_points(f) for f in faces])
+    return anchors.mean(axis=1), np.linalg.norm(anchors[:, 1] - anchors[:, 0], axis=1)
+
+
+def match_faces(ref_faces, faces):
+    """
+    Greedy nearest-center matching of one frame's faces to the reference faces.
+    Output: list with, per reference face, the index into faces (or None)
+    """
+    matches = [None] * len(ref_faces)
+    if not ref_faces or not faces:
+        return matches
+    ref_c, ref_size = _centers(ref_faces)
+    c, _ = _centers(faces)
+    dist = np.linalg.norm(ref_c[:, None] - c[None], axis=-1) / np.maximum(ref_size[:, None], 1e-6)
+    while True:
+        i, j = np.unravel_index(np.argmin(dist), dist.shape)
+        if dist[i, j] > MATCH_DIST:
+            break
+        matches[i] = int(j)
+        dist[i, :] = np.inf
+        dist[:, j] = np.inf
+    return matches
+
+
+def paste_face(dst, src, src_face, dst_face):
+    """
+    Warps the face at src_face in src onto dst_face in dst (in place), with
+    a feathered mask over the face hull.
+    Output: src_face's landmarks in dst coordinates (or None)
+    """
+    src_pts = np.asarray(src_face, dtype=np.float32)
+    dst_pts = np.asarray(dst_face, dtype=np.float32)
+    M, _ = cv2.estimateAffinePartial2D(src_pts, dst_pts, method=cv2.LMEDS)
+    if M is None:
+        return None
+
+    _, size = _centers([dst_face])
+    feather = max(3, int(size[0] * 0.1)) | 1
+    hull = cv2.convexHull(dst_pts.astype(np.int32))
+    x, y, w, h = cv2.boundingRect(hull)
+    x1, y1 = max(x - feather, 0), max(y - feather, 0)
+    x2, y2 = min(x + w + feather, dst.shape[1]), min(y + h + feather, dst.shape[0])
+    if x2 <= x1 or y2 <= y1:
+        return None
+
+    # Only the face box is warped, shifted so (x1, y1) lands at its origin
+    shifted = M.copy()
+    shifted[:, 2] -= (x1, y1)
+    patch = cv2.warpAffine(src, shifted, (x2 - x1, y2 - y1), flags=cv2.INTER_LINEAR,
+                           borderMode=cv2.BORDER_REPLICATE)
+    mask = np.zeros((y2 - y1, x2 - x1), np.uint8)
+    cv2.fillConvexPoly(mask, hull - (x1, y1), 255)
+    # Keep the soft edge inside the face outline
+    mask = cv2.erode(mask, np.ones((feather, feather), np.uint8))
+    alpha = cv2.GaussianBlur(mask, (2 * feather + 1, 2 * feather + 1), 0)
+    dst[y1:y2, x1:x2] = blend(dst[y1:y2, x1:x2], patch, alpha)
+
+    moved = cv2.transform(src_pts[None], M)[0]
+    return [tuple(p) for p in np.rint(moved).astype(int).tolist()]
+
+
+def best_shot(frames, smile_intensity=6, gaze_intensity=1.0, progress=None):
+    """
+    Burst "best shot": picks each person's best face across the frames and
+    composites it into one reference frame, then runs gaze/smile correction
+    only on faces that still need it.
+    Input: list of BGR images (ndarrays or Frames) of the same scene
+    Output: (PatchedImage of the edits over the reference frame, people, reference index);
+    people has one dict per face in the reference: frame, score, ear, gaze, lift, edits
+    """
+    if not frames:
+        raise ValueError("best_shot needs at least one frame")
+    frames = [as_bgr(f) for f in frames]
+    with stage("landmarks"):
+        all_faces = get_backend(landmark_backend()).detect_batch(frames)
+
+    # One scoring batch for every face of every frame
+    with stage("score"):
+        flat = [face for faces in all_faces for face in faces]
+        metrics = score_faces(flat)
+        offsets = np.cumsum([0] + [len(faces) for faces in all_faces])
+        totals = [metrics["score"][offsets[k]:offsets[k + 1]].sum() for k in range(len(frames))]
+
+    # Reference: the frame with the most faces, then the best total score
+    ref = max(range(len(frames)), key=lambda k: (len(all_faces[k]), totals[k]))
+    ref_faces = all_faces[ref]
+    output = frames[ref].copy()
+    people = []
+
+    with stage("composite"):
+        candidates = [[(ref, i)] for i in range(len(ref_faces))]
+        for k in range(len(frames)):
+            if k == ref:
+                continue
+            for i, j in enumerate(match_faces(ref_faces, all_faces[k])):
+                if j is not None:
+                    candidates[i].append((k, j))
+
+        for i, options in enumerate(candidates):
+            def score(option):
+                return metrics["score"][offsets[option[0]] + option[1]]
+            k, j = max(options, key=score)
+            if k != ref and score((k, j)) < score((ref, i)) + KEEP_MARGIN:
+                k, j = ref, i
+            face = ref_faces[i]
+            if k != ref:
+                face = paste_face(output, frames[k], all_faces[k][j], ref_faces[i])
+                if face is None:
+                    k, j, face = ref, i, ref_faces[i]
+            n = offsets[k] + j
+            people.append({"frame": k, "face": face, "score": float(metrics["score"][n]),
+                           "ear": float(metrics["ear"][n]), "gaze": float(metrics["gaze"][n]),
+                           "lift": float(metrics["lift"][n]), "edits": []})
+
+    # Whatever the burst couldn't give us, fix on the chosen face
+    for i, person in enumerate(people):
+        if progress:
+            progress(i / max(len(people), 1))
+        if gaze_intensity and person["gaze"] > GAZE_OK:
+            edit_aligned(output, person["face"],
+                         lambda chip, lm, scale: correct_gaze(chip, lm, intensity=gaze_intensity, scale=scale),
+                         copy=False)
+            person["edits"].append("gaze")
+        if smile_intensity and person["lift"] < SMILE_OK:
+            edit_aligned(output, person["face"],
+                         lambda chip, lm, scale: warp_smile(chip, lm, intensity=smile_intensity, scale=scale),
+                         copy=False)
+            person["edits"].append("smile")
+
+    original = frames[ref]
+    return PatchedImage.from_diff(original, output), people, ref
@@ -0,0 +1,211 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def image_hash(image):
+    """
+    Content hash of a pixel buffer (numpy array).
+    Shape and dtype are part of the key so a reshaped buffer never collides.
+    """
+    h = hashlib.sha1()
+    h.update(str(image.shape).encode())
+    h.update(str(image.dtype).encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+
+class LRUCache:
+    """Small thread-safe in-memory LRU used for per-process memoization."""
+
+    def __init__(self, max_items=256):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+MARKER = ".pp-cache"
+
+
+class DiskCache:
+    """
+    Size-capped on-disk bytes cache shared by every process on the host.
+    Writes are atomic (temp file + os.replace), eviction is oldest-mtime first.
+    Entries live under directory/namespace. stale(name) picks the sibling
+    namespaces to delete on start (e.g. older pipeline versions); nothing is
+    deleted unless the cache created `directory` itself (marker file), so
+    pointing it at a shared directory is safe.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, namespace="default", stale=None):
+        self.root = directory
+        self.dir = os.path.join(directory, namespace)
+        self.max_bytes = max_bytes
+        if not os.path.isdir(directory) or not os.listdir(directory):
+            os.makedirs(directory, exist_ok=True)
+            open(os.path.join(directory, MARKER), "a").close()
+        os.makedirs(self.dir, exist_ok=True)
+
+        if stale is not None and os.path.exists(os.path.join(directory, MARKER)):
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if name != namespace and os.path.isdir(path) and stale(name):
+                    shutil.rmtree(path, ignore_errors=True)
+
+        self._lock = threading.Lock()
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.dir, digest[:2], digest + ".bin")
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.dir):
+            for name in filenames:
+                if not name.endswith(".bin"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # Overwriting a key replaces its old file: only the difference counts
+            try:
+                old = os.stat(path).st_size
+            except FileNotFoundError:
+                old = 0
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self._size += len(data) - old
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        """Removes this namespace's entries (other processes may be using them too)."""
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = 0
+
+    def _evict(self):
+        # Rescan: other processes write here too
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+
+class TieredCache:
+    """In-memory LRU in front of a DiskCache, with hit/miss counters. Values are bytes."""
+
+    def __init__(self, directory, namespace="default", max_items=64, max_bytes=512 * 1024 * 1024, stale=None):
+        self.memory = LRUCache(max_items=max_items)
+        self.disk = DiskCache(directory, max_bytes=max_bytes, namespace=namespace, stale=stale)
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    def get(self, key):
+        data = self.memory.get(key)
+        if data is not None:
+            self._count("hits_memory")
+            return data
+        data = self.disk.get(key)
+        if data is not None:
+            self.memory.put(key, data)
+            self._count("hits_disk")
+            return data
+        self._count("misses")
+        return None
+
+    def put(self, key, data):
+        self.memory.put(key, data)
+        self.disk.put(key, data)
+
+    def clear(self):
+        self.memory.clear()
+        self.disk.clear()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits_memory + self.hits_disk + self.misses
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": (self.hits_memory + self.hits_disk) / total if total else 0.0,
+            }
@@ -1,14 +1,21 @@
 from ai.image_quality import *
+from ai.profiling import stage
+from ai.image_container import as_bgr
 
 def apply_chat_edits(image, command):
-    image = adjust_brightness_contrast(
-        image,
-        brightness=command.get("brightness", 0),
-        contrast=command.get("contrast", 0)
-    )
+    image = as_bgr(image)
+    with stage("brightness_contrast"):
+        image = adjust_brightness_contrast(
+            image,
+            brightness=command.get("brightness", 0),
+            contrast=command.get("contrast", 0)
+        )
 
-    image = apply_softness(image, command.get("softness", 0.0))
-    image = apply_sharpness(image, command.get("sharpness", 0.0))
-    image = apply_warmth(image, command.get("warmth", 0))
+    with stage("softness"):
+        image = apply_softness(image, command.get("softness", 0.0))
+    with stage("sharpness"):
+        image = apply_sharpness(image, command.get("sharpness", 0.0))
+    with stage("warmth"):
+        image = apply_warmth(image, command.get("warmth", 0))
 
     return image
@@ -0,0 +1,75 @@
+import functools
+import cv2
+import numpy as np
+
+# Shared helpers for pasting edited face regions back into the frame.
+# Alpha is always single-channel: float32 in [0, 1] or uint8 in [0, 255]
+# (uint16 fixed point). Cached masks/LUTs are shared; copy before editing them.
+
+
+@functools.lru_cache(maxsize=64)
+def gamma_lut(gamma):
+    """256-entry uint8 LUT for V_new = 255 * (V_old / 255) ^ (1 / gamma)."""
+    table = ((np.arange(256) / 255.0) ** (1.0 / gamma)) * 255
+    return table.astype(np.uint8)
+
+
+def adjust_gamma(image, gamma=1.0):
+    return cv2.LUT(image, gamma_lut(float(gamma)))
+
+
+@functools.lru_cache(maxsize=256)
+def feather_circle(h, w, radius, blur=1.0):
+    """Anti-aliased filled circle centered in an h x w float32 mask, lightly feathered."""
+    mask = np.zeros((h, w), dtype=np.float32)
+    cv2.circle(mask, (w // 2, h // 2), max(1, radius), 1.0, -1, lineType=cv2.LINE_AA)
+    if blur > 0:
+        mask = cv2.GaussianBlur(mask, (3, 3), blur)
+    return mask
+
+
+@functools.lru_cache(maxsize=256)
+def ellipse_mask(h, w):
+    """Single-channel uint8 ellipse filling an h x w box."""
+    mask = np.zeros((h, w), dtype=np.uint8)
+    cv2.ellipse(mask, (w // 2, h // 2), (w // 2, h // 2), 0, 0, 360, 255, -1)
+    return mask
+
+
+@functools.lru_cache(maxsize=256)
+def feather_ellipse(h, w, feather):
+    """Float32 ellipse alpha with a soft edge of roughly `feather` pixels."""
+    mask = ellipse_mask(h, w).astype(np.float32) * (1.0 / 255.0)
+    if feather > 0:
+        k = int(feather) * 2 + 1
+        mask = cv2.GaussianBlur(mask, (k, k), 0)
+    return mask
+
+
+def blend(dst, src, alpha):
+    """
+    Returns src * alpha + dst * (1 - alpha) as uint8.
+    dst/src: uint8 HxWxC (or HxW), alpha: HxW single channel.
+    float32 alpha uses cv2.blendLinear; uint8 alpha uses uint16 fixed point.
+    """
+    if alpha.dtype == np.uint8:
+        return blend_fixed(dst, src, alpha)
+    alpha = np.ascontiguousarray(alpha, dtype=np.float32)
+    return cv2.blendLinear(src, dst, alpha, 1.0 - alpha)
+
+
+def blend_fixed(dst, src, alpha):
+    """uint16 fixed-point blend with an 8-bit alpha (255 = src)."""
+    a = alpha.astype(np.uint16)
+    if dst.ndim == 3:
+        a = a[:, :, None]
+    out = src.astype(np.uint16) * a
+    out += dst.astype(np.uint16) * (255 - a)
+    out += 127
+    out //= 255
+    return out.astype(np.uint8)
+
+
+def to_alpha8(alpha):
+    """float32 [0, 1] alpha -> uint8 alpha for the fixed-point path."""
+    return cv2.convertScaleAbs(alpha, alpha=255.0)
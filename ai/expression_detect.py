@@ -1,15 +1,105 @@
-from transformers import pipeline
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
-import cv2
 
-emotion_classifier = pipeline(
-    "image-classification",
-    model="nateraw/fer2013"
-)
+from ai.cache import LRUCache, image_hash
+from ai.image_container import as_bgr, as_rgb
 
-def detect_expression(face_img):
-    face_rgb = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-    pil_img = Image.fromarray(face_rgb)
+MODEL_ID = "nateraw/fer2013"
+BATCH_SIZE = 16
+
+_classifier = None
+_distribution_cache = LRUCache(max_items=1024)
+# One worker runs the async calls in order, off the caller's thread. The
+# sync detect_expressions still runs on whichever thread calls it, so the
+# classifier can be in use from several threads at once.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="expression")
+
+
+def get_classifier():
+    global _classifier
+    if _classifier is None:
+        from transformers import pipeline
+        _classifier = pipeline(
+            "image-classification",
+            model=MODEL_ID
+        )
+    return _classifier
+
+
+def set_classifier(classifier):
+    """Swap in another classifier (e.g. a stub for offline runs)."""
+    global _classifier
+    _classifier = classifier
+    _distribution_cache.clear()
+
+
+def _num_labels(classifier):
+    try:
+        return len(classifier.model.config.id2label)
+    except AttributeError:
+        return 7  # fer2013 classes
+
+
+def detect_expressions(face_imgs, batch_size=BATCH_SIZE):
+    """
+    Input: list of BGR face crops or Frames (from one image or many)
+    Output: list of label distributions, one dict {label: score} per crop
+    """
+    results = [None] * len(face_imgs)
+    keys = []
+    todo = []
+    for i, face_img in enumerate(face_imgs):
+        key = image_hash(as_bgr(face_img))
+        keys.append(key)
+        cached = _distribution_cache.get(key)
+        if cached is not None:
+            results[i] = dict(cached)
+        else:
+            todo.append(i)
+
+    if todo:
+        classifier = get_classifier()
+        pil_imgs = [
+            Image.fromarray(as_rgb(face_imgs[i]))
+            for i in todo
+        ]
+        # Ask for every label so callers get the full distribution
+        outputs = classifier(pil_imgs, batch_size=batch_size, top_k=_num_labels(classifier))
+
+        for i, output in zip(todo, outputs):
+            dist = {item["label"]: float(item["score"]) for item in output}
+            _distribution_cache.put(keys[i], dist)
+            results[i] = dict(dist)
 
-    result = emotion_classifier(pil_img)
-    return result[0]["label"]  
+    return results
+
+
+def detect_expressions_async(face_imgs, batch_size=BATCH_SIZE):
+    """Same as detect_expressions but runs on the worker thread; returns a Future."""
+    return _executor.submit(detect_expressions, list(face_imgs), batch_size)
+
+
+def detect_expressions_grouped(crops_per_image, batch_size=BATCH_SIZE):
+    """
+    Input: list of lists of face crops, one list per image
+    Output: matching nested list of distributions
+
+    Crops of all images are scored together so batches stay full.
+    """
+    flat = [crop for crops in crops_per_image for crop in crops]
+    dists = detect_expressions(flat, batch_size=batch_size)
+
+    grouped = []
+    start = 0
+    for crops in crops_per_image:
+        grouped.append(dists[start:start + len(crops)])
+        start += len(crops)
+    return grouped
+
+
+def top_label(dist):
+    return max(dist, key=dist.get) if dist else None
+
+
+def detect_expression(face_img):
+    return top_label(detect_expressions([face_img])[0])
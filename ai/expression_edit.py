@@ -1,24 +1,113 @@
-import torch
-from diffusers import StableDiffusionImg2ImgPipeline
-from PIL import Image
+import os
 import cv2
+import numpy as np
+from PIL import Image
+
+from ai.cache import LRUCache, image_hash
+
+MODEL_ID = "runwayml/stable-diffusion-v1-5"
+
+# Defaults are tuned for a GPU host. On CPU-only hosts override with
+# PP_EDIT_STEPS / PP_EDIT_SIZE (e.g. 8 steps at 256px keeps it usable).
+EDIT_STEPS = int(os.environ.get("PP_EDIT_STEPS", 30))
+EDIT_SIZE = int(os.environ.get("PP_EDIT_SIZE", 512))
+EDIT_STRENGTH = 0.35
+GUIDANCE_SCALE = 7.5
+
+_pipe = None
+_edit_cache = LRUCache(max_items=128)
+
+
+def get_pipeline():
+    """Loads the img2img pipeline on first use (float16 only on CUDA)."""
+    global _pipe
+    if _pipe is None:
+        import torch
+        from diffusers import StableDiffusionImg2ImgPipeline
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        dtype = torch.float16 if device == "cuda" else torch.float32
+        _pipe = StableDiffusionImg2ImgPipeline.from_pretrained(
+            MODEL_ID,
+            torch_dtype=dtype
+        ).to(device)
+    return _pipe
+
+
+def set_pipeline(pipe):
+    """Swap in another pipeline (e.g. a tiny stub for offline runs)."""
+    global _pipe
+    _pipe = pipe
+    _edit_cache.clear()
+
+
+def _make_generators(pipe, seeds):
+    try:
+        import torch
+    except ImportError:
+        return None
+    device = getattr(pipe, "device", "cpu")
+    return [torch.Generator(device=device).manual_seed(int(s)) for s in seeds]
+
+
+def edit_expressions(face_imgs, target_expression, seed=0, steps=None, size=None):
+    """
+    Input: list of BGR face crops (any sizes)
+    Output: list of edited BGR crops, each at its crop's original size
+
+    All uncached crops are resized to a common size x size square and sent
+    through the pipeline as a single batch. Results are cached by
+    (crop hash, target expression, seed, steps, size).
+    """
+    steps = steps or EDIT_STEPS
+    size = size or EDIT_SIZE
+    # Stable Diffusion needs dimensions divisible by 8
+    size = max(8, size - size % 8)
+
+    results = [None] * len(face_imgs)
+    keys = []
+    todo = []
+    for i, face_img in enumerate(face_imgs):
+        key = (image_hash(face_img), target_expression, seed, steps, size)
+        keys.append(key)
+        cached = _edit_cache.get(key)
+        if cached is not None:
+            results[i] = cached.copy()
+        else:
+            todo.append(i)
+
+    if todo:
+        pipe = get_pipeline()
+        prompt = f"a realistic human face with a {target_expression} expression"
+
+        batch = []
+        for i in todo:
+            face_rgb = cv2.cvtColor(face_imgs[i], cv2.COLOR_BGR2RGB)
+            face_rgb = cv2.resize(face_rgb, (size, size), interpolation=cv2.INTER_AREA)
+            batch.append(Image.fromarray(face_rgb))
+
+        # One generator per image keeps each face reproducible regardless of
+        # which other faces share the batch
+        generators = _make_generators(pipe, [seed] * len(todo))
+
+        edited = pipe(
+            prompt=[prompt] * len(todo),
+            image=batch,
+            strength=EDIT_STRENGTH,
+            guidance_scale=GUIDANCE_SCALE,
+            num_inference_steps=steps,
+            generator=generators
+        ).images
+
+        for i, out in zip(todo, edited):
+            h, w = face_imgs[i].shape[:2]
+            out_bgr = cv2.cvtColor(np.array(out), cv2.COLOR_RGB2BGR)
+            out_bgr = cv2.resize(out_bgr, (w, h), interpolation=cv2.INTER_LINEAR)
+            _edit_cache.put(keys[i], out_bgr)
+            results[i] = out_bgr.copy()
+
+    return results
+
 
-pipe = StableDiffusionImg2ImgPipeline.from_pretrained(
-    "runwayml/stable-diffusion-v1-5",
-    torch_dtype=torch.float16
-).to("cuda" if torch.cuda.is_available() else "cpu")
-
-def edit_expression(face_img, target_expression):
-    prompt = f"a realistic human face with a {target_expression} expression"
-    
-    face_rgb = cv2.cvtColor(face_img, cv2.COLOR_BGR2RGB)
-    pil_img = Image.fromarray(face_rgb)
-
-    result = pipe(
-        prompt=prompt,
-        image=pil_img,
-        strength=0.35,
-        guidance_scale=7.5
-    ).images[0]
-
-    return cv2.cvtColor(np.array(result), cv2.COLOR_RGB2BGR)
+def edit_expression(face_img, target_expression, seed=0):
+    return edit_expressions([face_img], target_expression, seed=seed)[0]
@@ -0,0 +1,134 @@
+import cv2
+import numpy as np
+from ai.compositing import blend, to_alpha8
+
+# Faces are edited in an upright chip. At canonical size (CANONICAL_SIZE
+# square, eyes 64 px apart) it matches the scale warp_eye / warp_smile were
+# tuned at (their paddings, the 40 px smile band and the smile intensity are
+# all in pixels); bigger faces get a chip up to MAX_CHIP_SCALE times larger,
+# with the edits' pixel sizes scaled to match, so a close-up isn't blurred by
+# a round trip through 64 px. Edit cost per face is bounded either way.
+CANONICAL_SIZE = 192
+EYE_DISTANCE = 64
+MAX_CHIP_SCALE = 4.0
+TEMPLATE = np.float32([
+    [64, 80],    # eye on the image left (MediaPipe 33/133)
+    [128, 80],   # eye on the image right (362/263)
+    [96, 146],   # mouth corners (61/291)
+])
+
+# MediaPipe Face Mesh indices averaged into each template point
+ANCHORS = [(33, 133), (362, 263), (61, 291)]
+
+FEATHER = 3  # px (chip scale) of soft edge around the changed region
+
+
+def anchor_points(landmarks):
+    pts = np.asarray(landmarks, dtype=np.float32)
+    return np.float32([pts[list(idx)].mean(axis=0) for idx in ANCHORS])
+
+
+def chip_scale(eye_distance):
+    """Chip size relative to canonical for a face with this eye distance (px)."""
+    return float(np.clip(eye_distance / EYE_DISTANCE, 1.0, MAX_CHIP_SCALE))
+
+
+def alignment_matrix(landmarks, size=CANONICAL_SIZE):
+    """
+    Input: 478-point face landmarks in image pixels
+    Output: 2x3 similarity transform image -> canonical chip (or None)
+    """
+    dst = TEMPLATE * (size / float(CANONICAL_SIZE))
+    # 3 points, all inliers: a huge threshold makes this a plain least-squares fit
+    M, _ = cv2.estimateAffinePartial2D(anchor_points(landmarks), dst,
+                                       method=cv2.RANSAC, ransacReprojThreshold=1e6)
+    return M
+
+
+def _scale(M):
+    return float(np.hypot(M[0, 0], M[1, 0]))
+
+
+def align_face(image, landmarks, size=CANONICAL_SIZE):
+    """
+    Output: (chip, chip_landmarks, M) with M mapping image -> chip,
+    or None if the landmarks don't give a usable transform.
+    """
+    M = alignment_matrix(landmarks, size)
+    if M is None or _scale(M) < 1e-3:
+        return None
+
+    if _scale(M) < 0.5:
+        # Big face: sample at 2x and area-average down, so the warp isn't
+        # skipping most source pixels (aliasing). Cost stays bounded by size.
+        chip = cv2.warpAffine(image, M * 2, (size * 2, size * 2), flags=cv2.INTER_CUBIC,
+                              borderMode=cv2.BORDER_REPLICATE)
+        chip = cv2.resize(chip, (size, size), interpolation=cv2.INTER_AREA)
+    else:
+        chip = cv2.warpAffine(image, M, (size, size), flags=cv2.INTER_CUBIC,
+                              borderMode=cv2.BORDER_REPLICATE)
+    pts = cv2.transform(np.asarray(landmarks, dtype=np.float32)[None], M)[0]
+    chip_landmarks = [tuple(p) for p in np.rint(pts).astype(int).tolist()]
+    return chip, chip_landmarks, M
+
+
+def paste_back(image, chip, edited_chip, M, feather=FEATHER):
+    """
+    Warps only the part of edited_chip that differs from chip back into
+    image (in place) with a feathered mask. Returns image.
+    """
+    diff = cv2.absdiff(chip, edited_chip)
+    channels = cv2.split(diff)
+    diff = channels[0]
+    for c in channels[1:]:
+        diff = cv2.max(diff, c)
+    if cv2.countNonZero(diff) == 0:
+        return image
+
+    _, changed = cv2.threshold(diff, 0, 255, cv2.THRESH_BINARY)
+    k = 2 * feather + 1
+    changed = cv2.dilate(changed, np.ones((k, k), np.uint8))
+    alpha = cv2.GaussianBlur(changed.astype(np.float32) * np.float32(1.0 / 255.0), (k, k), 0)
+
+    # Changed box in chip coords -> image box
+    x, y, w, h = cv2.boundingRect(changed)
+    inv = cv2.invertAffineTransform(M)
+    corners = cv2.transform(np.float32([[[x, y], [x + w, y], [x, y + h], [x + w, y + h]]]), inv)[0]
+    x1, y1 = np.maximum(np.floor(corners.min(axis=0)).astype(int) - 1, 0)
+    x2, y2 = np.minimum(np.ceil(corners.max(axis=0)).astype(int) + 1, image.shape[1::-1])
+    if x2 <= x1 or y2 <= y1:
+        return image
+
+    # chip -> image, shifted so (x1, y1) lands at the box origin. Colour and
+    # alpha go through one 4-channel warp.
+    back = inv.copy()
+    back[:, 2] -= (x1, y1)
+    dsize = (int(x2 - x1), int(y2 - y1))
+    bgra = cv2.merge([*cv2.split(edited_chip), to_alpha8(alpha)])
+    warped = cv2.warpAffine(bgra, back, dsize, flags=cv2.INTER_CUBIC,
+                            borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+    *colour, patch_alpha = cv2.split(warped)
+    patch = cv2.merge(colour)
+
+    image[y1:y2, x1:x2] = blend(image[y1:y2, x1:x2], patch, patch_alpha)
+    return image
+
+
+def edit_aligned(image, landmarks, edit, size=CANONICAL_SIZE, copy=True):
+    """
+    Runs edit(chip, chip_landmarks, scale) -> edited chip on the aligned face
+    and blends the changed region back. scale is the chip's size relative to
+    canonical: the edit multiplies its pixel sizes by it.
+    Input: BGR image, 478-point landmarks in image pixels
+    Output: edited image (a copy unless copy=False)
+    """
+    eyes = anchor_points(landmarks)
+    size = int(round(size * chip_scale(float(np.linalg.norm(eyes[1] - eyes[0])))))
+    aligned = align_face(image, landmarks, size)
+    if aligned is None:
+        return image.copy() if copy else image
+    chip, chip_landmarks, M = aligned
+    scale = size / float(CANONICAL_SIZE)
+    edited = edit(chip, chip_landmarks, scale)
+    return paste_back(image.copy() if copy else image, chip, edited, M,
+                      feather=max(1, int(round(FEATHER * scale))))
@@ -0,0 +1,169 @@
+import threading
+import time
+import cv2
+import numpy as np
+from ai.image_container import as_rgb
+
+MODEL_PATH = "models/face_landmarker.task"
+NUM_FACES = 5
+
+
+def _to_mp_image(image):
+    import mediapipe as mp
+    return mp.Image(image_format=mp.ImageFormat.SRGB, data=as_rgb(image))
+
+
+def _convert_result(result, w, h):
+    """
+    Converts a FaceLandmarkerResult into a list of faces:
+    {"landmarks": [(x, y), ...] in pixels (478 points, same indexing as face_mesh),
+     "blendshapes": {name: score},
+     "matrix": 4x4 facial transformation matrix (or None)}
+    """
+    faces = []
+    for i, face_landmarks in enumerate(result.face_landmarks):
+        face = {
+            "landmarks": [(int(lm.x * w), int(lm.y * h)) for lm in face_landmarks],
+            "blendshapes": {},
+            "matrix": None,
+        }
+        if result.face_blendshapes:
+            face["blendshapes"] = {
+                c.category_name: float(c.score) for c in result.face_blendshapes[i]
+            }
+        if result.facial_transformation_matrixes:
+            face["matrix"] = np.array(result.facial_transformation_matrixes[i], dtype=np.float32)
+        faces.append(face)
+    return faces
+
+
+class FaceLandmarkerService:
+    """
+    Long-lived wrapper around the Tasks API FaceLandmarker with the bundled model.
+
+    mode="image": detect(image) returns faces synchronously.
+    mode="live_stream": submit(image, tag) returns immediately; callback(faces, tag)
+    is called from MediaPipe's thread when the result is ready.
+    """
+
+    def __init__(self, mode="image", num_faces=NUM_FACES, model_path=MODEL_PATH,
+                 callback=None, max_in_flight=1):
+        from mediapipe.tasks import python
+        from mediapipe.tasks.python import vision
+
+        self.mode = mode
+        self.callback = callback
+        # LIVE_STREAM drops frames that arrive while the graph is busy,
+        # so submissions are throttled to max_in_flight
+        self.max_in_flight = max_in_flight
+        self._cond = threading.Condition()
+        # IMAGE-mode detect() is shared by every Studio session's thread
+        self._detect_lock = threading.Lock()
+        self._pending = {}
+        self._last_ts = -1
+
+        running_mode = {
+            "image": vision.RunningMode.IMAGE,
+            "live_stream": vision.RunningMode.LIVE_STREAM,
+        }[mode]
+
+        options = vision.FaceLandmarkerOptions(
+            base_options=python.BaseOptions(model_asset_path=model_path),
+            running_mode=running_mode,
+            num_faces=num_faces,
+            output_face_blendshapes=True,
+            output_facial_transformation_matrixes=True,
+            result_callback=self._on_result if mode == "live_stream" else None
+        )
+        self._landmarker = vision.FaceLandmarker.create_from_options(options)
+
+    def detect(self, image):
+        if self.mode != "image":
+            raise RuntimeError("detect() needs mode='image'; use submit() in live_stream mode")
+        h, w = image.shape[:2]
+        with self._detect_lock:
+            result = self._landmarker.detect(_to_mp_image(image))
+        return _convert_result(result, w, h)
+
+    def submit(self, image, tag=None, timeout=30.0):
+        if self.mode != "live_stream":
+            raise RuntimeError("submit() needs mode='live_stream'")
+        h, w = image.shape[:2]
+        mp_image = _to_mp_image(image)
+
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._pending) < self.max_in_flight, timeout):
+                raise TimeoutError("FaceLandmarker did not return a result in time")
+            # Timestamps must be strictly increasing
+            ts = max(self._last_ts + 1, int(time.monotonic() * 1000))
+            self._last_ts = ts
+            self._pending[ts] = (tag, w, h)
+
+        self._landmarker.detect_async(mp_image, ts)
+
+    def wait(self, timeout=30.0):
+        """Blocks until every submitted image has produced its callback."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: not self._pending, timeout):
+                raise TimeoutError("FaceLandmarker did not return a result in time")
+
+    def _on_result(self, result, output_image, timestamp_ms):
+        with self._cond:
+            tag, w, h = self._pending.get(timestamp_ms, (None, output_image.width, output_image.height))
+        # Deliver before releasing the slot so wait() never returns ahead of a callback
+        try:
+            if self.callback:
+                self.callback(_convert_result(result, w, h), tag)
+        finally:
+            with self._cond:
+                self._pending.pop(timestamp_ms, None)
+                self._cond.notify_all()
+
+    def close(self):
+        self._landmarker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_image_service = None
+
+
+def get_face_landmarks(image):
+    """
+    Drop-in for ai.face_mesh.get_face_landmarks using a shared IMAGE-mode service.
+    Output: list of faces, each face = list of (x, y) landmarks
+    """
+    global _image_service
+    if _image_service is None:
+        _image_service = FaceLandmarkerService(mode="image")
+    return [face["landmarks"] for face in _image_service.detect(image)]
+
+
+def landmark_images(sources, load=cv2.imread, num_faces=NUM_FACES):
+    """
+    Pipelined landmarking of many images in LIVE_STREAM mode:
+    while image N is in inference, image N+1 is being decoded.
+
+    sources: list of paths (or anything `load` accepts)
+    Output: list of per-image face lists (same format as FaceLandmarkerService)
+    """
+    results = [None] * len(sources)
+
+    def on_result(faces, tag):
+        results[tag] = faces
+
+    with FaceLandmarkerService(mode="live_stream", num_faces=num_faces, callback=on_result) as service:
+        next_img = load(sources[0]) if sources else None
+        for i in range(len(sources)):
+            img = next_img
+            if img is not None:
+                service.submit(img, tag=i)
+            # Decode the next image while the current one is being processed
+            next_img = load(sources[i + 1]) if i + 1 < len(sources) else None
+        service.wait()
+
+    return results
@@ -1,5 +1,5 @@
-import cv2
 import dlib
+from ai.image_container import as_gray
 
 detector = dlib.get_frontal_face_detector()
 predictor = dlib.shape_predictor(
@@ -7,7 +7,7 @@ predictor = dlib.shape_predictor(
 )
 
 def get_face_landmarks(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    gray = as_gray(image)
 
     faces = detector(gray)
     all_faces = []
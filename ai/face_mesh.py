@@ -1,11 +1,31 @@
-import cv2
-import numpy as np
+from ai.image_container import as_rgb
 
 def get_face_landmarks(image):
     """
-    Input: BGR image
+    Input: BGR image (ndarray) or Frame
     Output: list of faces, each face = list of (x, y) landmarks using MediaPipe Face Mesh
     """
+    face_mesh = _make_face_mesh()
+    if face_mesh is None:
+        return [] # Return empty list so app doesn't crash
+    with face_mesh:
+        return _detect(face_mesh, image)
+
+
+def get_face_landmarks_batch(images):
+    """
+    Input: list of BGR images (ndarray) or Frames, e.g. a burst
+    Output: one face list per image, as get_face_landmarks
+    The mesh model is created once for the whole batch instead of per image.
+    """
+    face_mesh = _make_face_mesh()
+    if face_mesh is None:
+        return [[] for _ in images]
+    with face_mesh:
+        return [_detect(face_mesh, image) for image in images]
+
+
+def _make_face_mesh():
     import mediapipe as mp
     
     mp_face_mesh = mp.solutions.face_mesh
@@ -14,7 +34,7 @@ def get_face_landmarks(image):
     # Try with refinement first (needed for eyes/gaze)
     try:
         # mp_face_mesh is already defined above safely
-        face_mesh = mp_face_mesh.FaceMesh(
+        return mp_face_mesh.FaceMesh(
             static_image_mode=True,
             max_num_faces=5,
             refine_landmarks=True,
@@ -23,7 +43,7 @@ def get_face_landmarks(image):
     except Exception as e:
         print(f"FaceMesh (Refined) failed: {e}. Falling back to basic mesh.")
         try:
-            face_mesh = mp_face_mesh.FaceMesh(
+            return mp_face_mesh.FaceMesh(
                 static_image_mode=True,
                 max_num_faces=5,
                 refine_landmarks=False,
@@ -31,27 +51,28 @@ def get_face_landmarks(image):
             )
         except Exception as e2:
             print(f"CRITICAL: Basic FaceMesh also failed: {e2}")
-            return [] # Return empty list so app doesn't crash
-    
+            return None
+
+
+def _detect(face_mesh, image):
     try:
-        with face_mesh:
-            # Convert the BGR image to RGB
-            results = face_mesh.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
-            
-            landmarks_all_faces = []
-    
-            if results.multi_face_landmarks:
-                h, w, _ = image.shape
-                # print(f"Detected {len(results.multi_face_landmarks)} face(s)")
-                
-                for face_landmarks in results.multi_face_landmarks:
-                    points = []
-                    for lm in face_landmarks.landmark:
-                        x, y = int(lm.x * w), int(lm.y * h)
-                        points.append((x, y))
-                    landmarks_all_faces.append(points)
+        # RGB view (cached when image is a Frame)
+        results = face_mesh.process(as_rgb(image))
+        
+        landmarks_all_faces = []
+
+        if results.multi_face_landmarks:
+            h, w = image.shape[:2]
+            # print(f"Detected {len(results.multi_face_landmarks)} face(s)")
             
-            return landmarks_all_faces
+            for face_landmarks in results.multi_face_landmarks:
+                points = []
+                for lm in face_landmarks.landmark:
+                    x, y = int(lm.x * w), int(lm.y * h)
+                    points.append((x, y))
+                landmarks_all_faces.append(points)
+        
+        return landmarks_all_faces
 
     except Exception as e3:
          print(f"Error during processing: {e3}")
@@ -1,5 +1,6 @@
 import cv2
 import numpy as np
+from ai.compositing import adjust_gamma, blend, feather_circle
 
 # MediaPipe Indices
 # Left Eye
@@ -41,24 +42,29 @@ def calculate_ear(landmarks, is_left_eye):
     ear = (v1 + v2) / (2.0 * h)
     return ear
 
+SHARPEN_KERNEL = np.array([[-1, -1, -1],
+                           [-1, 9, -1],
+                           [-1, -1, -1]], dtype=np.float32)
+
 def sharpen_image(image):
-    # Create a sharpening kernel
-    kernel = np.array([[-1, -1, -1],
-                       [-1, 9, -1],
-                       [-1, -1, -1]])
     # Apply the sharpening kernel
-    sharpened = cv2.filter2D(image, -1, kernel)
+    sharpened = cv2.filter2D(image, -1, SHARPEN_KERNEL)
     return sharpened
 
-def adjust_gamma(image, gamma=1.0):
-    # build a lookup table mapping the pixel values [0, 255] to their new adjusted values
-    invGamma = 1.0 / gamma
-    table = np.array([((i / 255.0) ** invGamma) * 255
-        for i in np.arange(0, 256)]).astype("uint8")
-    # apply gamma correction using the lookup table
-    return cv2.LUT(image, table)
+def fast_iris_fill(roi, mask_inpaint, mask_sclera):
+    # Cheap stand-in for inpainting: flat fill with the mean colour of the
+    # visible sclera around the iris (the moved iris covers most of it)
+    ring = cv2.bitwise_and(mask_sclera, cv2.bitwise_not(mask_inpaint))
+    if cv2.countNonZero(ring) == 0:
+        return roi.copy()
+    clean = roi.copy()
+    clean[mask_inpaint > 0] = cv2.mean(roi, mask=ring)[:3]
+    return clean
 
-def warp_eye(image, landmarks, is_left_eye, intensity=2.8):
+def warp_eye(image, landmarks, is_left_eye, intensity=2.8, fill="telea", scale=1.0):
+    # fill: "telea" inpaint or "fast" (mean sclera colour) for tight budgets
+    # scale: face size relative to 64 px between the eyes (grows the fixed-px
+    # dilation with it; the inpaint radius stays at 3, its cost is quadratic)
     if is_left_eye:
         idx_inner = LEFT_EYE_INNER
         idx_outer = LEFT_EYE_OUTER
@@ -124,14 +130,17 @@ def warp_eye(image, landmarks, is_left_eye, intensity=2.8):
         
         # 3. Inpaint the original Iris to check a blank eyeball
         # We dilate the iris mask significantly to ensure we don't leave dark edges
-        mask_iris_dilated = cv2.dilate(mask_iris, np.ones((5,5), np.uint8), iterations=3)
+        mask_iris_dilated = cv2.dilate(mask_iris, np.ones((5,5), np.uint8), iterations=max(1, int(round(3 * scale))))
         
         # CRITICAL FIX: Clip the inpainting mask to the eye contour (sclera)
         # This prevents inpainting from eating into the eyelids/skin
         mask_inpaint = cv2.bitwise_and(mask_iris_dilated, mask_sclera)
         
         # Inpaint: Replaces the iris with surrounding skin/sclera texture
-        clean_eye = cv2.inpaint(roi, mask_inpaint, 3, cv2.INPAINT_TELEA) # Reduced radius for sharper fill
+        if fill == "fast":
+            clean_eye = fast_iris_fill(roi, mask_inpaint, mask_sclera)
+        else:
+            clean_eye = cv2.inpaint(roi, mask_inpaint, 3, cv2.INPAINT_TELEA) # Reduced radius for sharper fill
         
         # 4. Extract the Iris
         iris_texture = roi.copy()
@@ -233,29 +242,17 @@ def warp_eye(image, landmarks, is_left_eye, intensity=2.8):
         # Prepare Sclera Mask slice at destination
         mask_slice = mask_sclera[start_y:end_y, start_x:end_x]
         
-        # Create a mini circular mask for the chip (SHARPER EDGES)
-        mini_mask = np.zeros((h_chip, w_chip), dtype=np.float32)
-        # Use anti-aliased circle but NOT blurry
-        cv2.circle(mini_mask, (w_chip//2, h_chip//2), iris_radius - 1, 1.0, -1, lineType=cv2.LINE_AA)
-        
-        # Minimal softening (1.5 sigma instead of 5)
-        mini_mask = cv2.GaussianBlur(mini_mask, (3, 3), 1.0)
+        # Mini circular mask for the chip (SHARPER EDGES): anti-aliased,
+        # minimal softening. Cached per chip size/radius.
+        mini_mask = feather_circle(h_chip, w_chip, iris_radius - 1)
         
         mini_mask_valid = mini_mask[chip_start_y:chip_end_y, chip_start_x:chip_end_x]
         
-        # Normalize Sclera Mask
-        mask_slice_float = mask_slice.astype(float) / 255.0
-        
-        # Combine masks: Multiply
-        final_mask_float = mask_slice_float * mini_mask_valid
-        
-        # Composite
-        final_mask_3ch = cv2.merge([final_mask_float, final_mask_float, final_mask_float])
-        
-        blended = valid_chip.astype(float) * final_mask_3ch + dest_slice.astype(float) * (1.0 - final_mask_3ch)
+        # Combine masks: sclera (0..255) * circle (0..1), single channel float32
+        final_mask = mini_mask_valid * (mask_slice.astype(np.float32) * np.float32(1.0 / 255.0))
         
-        # Update result
-        result[start_y:end_y, start_x:end_x] = blended.astype(np.uint8)
+        # Composite and update result
+        result[start_y:end_y, start_x:end_x] = blend(dest_slice, valid_chip, final_mask)
         
         # Paste result back to image
         image[y1:y2, x1:x2] = result
@@ -266,10 +263,10 @@ def warp_eye(image, landmarks, is_left_eye, intensity=2.8):
         print(f"Error in warp_eye: {e}")
         return image
 
-def correct_gaze(image, landmarks, intensity=1.0):
+def correct_gaze(image, landmarks, intensity=1.0, fill="telea", scale=1.0):
     img = image.copy()
-    img = warp_eye(img, landmarks, is_left_eye=True, intensity=intensity)
-    img = warp_eye(img, landmarks, is_left_eye=False, intensity=intensity)
+    img = warp_eye(img, landmarks, is_left_eye=True, intensity=intensity, fill=fill, scale=scale)
+    img = warp_eye(img, landmarks, is_left_eye=False, intensity=intensity, fill=fill, scale=scale)
     return img
 
 def draw_debug_gaze(image, landmarks, is_left_eye):
@@ -0,0 +1,122 @@
+import itertools
+import threading
+import contextlib
+import cv2
+import numpy as np
+
+PREVIEW_SIDE = 1280
+
+_versions = itertools.count(1)
+
+_CONVERSIONS = {
+    ("BGR", "RGB"): cv2.COLOR_BGR2RGB,
+    ("RGB", "BGR"): cv2.COLOR_RGB2BGR,
+    ("BGR", "GRAY"): cv2.COLOR_BGR2GRAY,
+    ("RGB", "GRAY"): cv2.COLOR_RGB2GRAY,
+}
+
+
+class Frame:
+    """
+    A pixel buffer that knows its channel order.
+
+    Derived views (RGB/BGR, grayscale, downscaled preview) are computed on
+    first use and cached until the buffer changes, so each conversion runs at
+    most once per version. Views are shared: treat them as read-only.
+    """
+
+    def __init__(self, data, order="BGR"):
+        if order not in ("BGR", "RGB"):
+            raise ValueError(f"Unsupported channel order: {order}")
+        self._data = data
+        self.order = order
+        self.version = next(_versions)
+        self._views = {}
+        self._lock = threading.Lock()
+
+    @property
+    def data(self):
+        return self._data
+
+    @property
+    def shape(self):
+        return self._data.shape
+
+    def update(self, data, order=None):
+        """Replaces the buffer (e.g. with an edited copy) and drops cached views."""
+        with self._lock:
+            self._data = data
+            self.order = order or self.order
+            self.version = next(_versions)
+            self._views = {}
+
+    @contextlib.contextmanager
+    def mutate(self):
+        """For in-place edits: `with frame.mutate() as pixels: ...`"""
+        try:
+            yield self._data
+        finally:
+            # Even if the edit raised half way, the pixels may have changed
+            with self._lock:
+                self.version = next(_versions)
+                self._views = {}
+
+    def _view(self, name, make):
+        with self._lock:
+            view = self._views.get(name)
+            version = self.version
+        if view is None:
+            view = make()
+            with self._lock:
+                if self.version == version:
+                    self._views[name] = view
+        return view
+
+    def _convert(self, target):
+        if target == self.order:
+            return self._data
+        return self._view(target, lambda: cv2.cvtColor(self._data, _CONVERSIONS[(self.order, target)]))
+
+    def bgr(self):
+        return self._convert("BGR")
+
+    def rgb(self):
+        return self._convert("RGB")
+
+    def gray(self):
+        return self._convert("GRAY")
+
+    def preview(self, max_side=PREVIEW_SIDE, order="RGB"):
+        """Downscaled copy (longest side <= max_side) for display."""
+        def make():
+            src = self._convert(order)
+            h, w = src.shape[:2]
+            scale = max_side / float(max(h, w))
+            if scale >= 1.0:
+                return src
+            return cv2.resize(src, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        return self._view(f"preview-{order}-{max_side}", make)
+
+
+# Helpers so pipeline functions accept either a Frame or a plain BGR ndarray
+
+def as_bgr(image):
+    return image.bgr() if isinstance(image, Frame) else image
+
+
+def as_rgb(image):
+    if isinstance(image, Frame):
+        return image.rgb()
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+def as_gray(image):
+    if isinstance(image, Frame):
+        return image.gray()
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def as_frame(image):
+    return image if isinstance(image, Frame) else Frame(np.asarray(image))
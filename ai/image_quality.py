@@ -1,28 +1,93 @@
 import cv2
 import numpy as np
 
+# Large images are filtered in TILE x TILE blocks (plus a halo of context on
+# each side) so temporaries stay bounded no matter how big the frame is.
+TILE = 1024
+# Gaussians wider than this sigma go through downscale -> blur -> upscale
+MAX_DIRECT_SIGMA = 4.0
+
 def adjust_brightness_contrast(img, brightness=0, contrast=0):
     img = img.astype(np.int16)
     img = img * (1 + contrast / 100) + brightness
     img = np.clip(img, 0, 255)
     return img.astype(np.uint8)
 
+def _kernel_sigma(k):
+    # Sigma OpenCV derives for GaussianBlur(img, (k, k), 0)
+    return 0.3 * ((k - 1) * 0.5 - 1) + 0.8
+
+def _process_tiled(img, fn, halo, tile=TILE):
+    """
+    Applies fn to overlapping tiles and stitches the centers into one output.
+    fn must be a local filter whose reach is <= halo pixels. Tiles are clipped
+    at the frame edge, so the border handling matches a full-frame call.
+    """
+    h, w = img.shape[:2]
+    if h <= tile and w <= tile:
+        return fn(img)
+
+    out = np.empty_like(img)
+    for y0 in range(0, h, tile):
+        y1 = min(h, y0 + tile)
+        for x0 in range(0, w, tile):
+            x1 = min(w, x0 + tile)
+            hy0, hx0 = max(0, y0 - halo), max(0, x0 - halo)
+            hy1, hx1 = min(h, y1 + halo), min(w, x1 + halo)
+
+            res = fn(img[hy0:hy1, hx0:hx1])
+            out[y0:y1, x0:x1] = res[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0]
+    return out
+
+def _large_blur(img, sigma):
+    """
+    Gaussian approximation for wide kernels: INTER_AREA downscale by f,
+    blur with the remaining sigma, linear upscale back.
+    Box (f^2/12) + linear upscale (f^2/6) variance is taken out of the blur.
+    """
+    f = max(2, int(sigma / 2))
+    h, w = img.shape[:2]
+    small = cv2.resize(img, (max(1, w // f), max(1, h // f)), interpolation=cv2.INTER_AREA)
+    small_sigma = np.sqrt(max(sigma ** 2 - f ** 2 / 4.0, 0.25)) / f
+    small = cv2.GaussianBlur(small, (0, 0), small_sigma)
+    return cv2.resize(small, (w, h), interpolation=cv2.INTER_LINEAR)
+
+def gaussian_blur(img, sigma, ksize=0, tile=TILE):
+    """
+    Tiled Gaussian blur. Small kernels are exact (same as cv2.GaussianBlur);
+    kernels with sigma > MAX_DIRECT_SIGMA use the downscaled approximation.
+    """
+    if sigma <= MAX_DIRECT_SIGMA:
+        k = (ksize, ksize) if ksize else (0, 0)
+        halo = ksize // 2 + 1 if ksize else int(np.ceil(4 * sigma)) + 1
+        return _process_tiled(img, lambda t: cv2.GaussianBlur(t, k, sigma if not ksize else 0), halo, tile)
+
+    f = max(2, int(sigma / 2))
+    halo = int(np.ceil(4 * sigma)) + 2 * f
+    return _process_tiled(img, lambda t: _large_blur(t, sigma), halo, tile)
+
 def apply_softness(img, softness=0.0):
     if softness <= 0:
         return img
     k = int(softness * 30) * 2 + 1
-    return cv2.GaussianBlur(img, (k, k), 0)
+    return gaussian_blur(img, _kernel_sigma(k), ksize=k)
 
 def apply_sharpness(img, sharpness=0.0):
     if sharpness <= 0:
         return img
-    blur = cv2.GaussianBlur(img, (0, 0), 3)
-    return cv2.addWeighted(img, 1 + sharpness, blur, -sharpness, 0)
+
+    def unsharp(tile):
+        blur = cv2.GaussianBlur(tile, (0, 0), 3)
+        return cv2.addWeighted(tile, 1 + sharpness, blur, -sharpness, 0)
+
+    # sigma 3 -> OpenCV kernel radius 9 for 8-bit images
+    return _process_tiled(img, unsharp, halo=13)
 
 def apply_warmth(img, warmth=0):
     if warmth == 0:
         return img
     b, g, r = cv2.split(img)
-    r = np.clip(r + warmth, 0, 255)
-    b = np.clip(b - warmth, 0, 255)
+    # Saturating add: uint8 + int in numpy wraps around (or raises for negatives)
+    r = cv2.add(r, float(warmth))
+    b = cv2.subtract(b, float(warmth))
     return cv2.merge([b, g, r])
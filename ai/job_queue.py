@@ -0,0 +1,314 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+
+QUEUE_DIR = os.environ.get("PP_QUEUE_DIR", ".cache/jobs")
+LEASE_SECONDS = 60.0
+MAX_ATTEMPTS = 3
+WORKER_TIMEOUT = 30.0  # a worker that hasn't checked in for this long counts as gone
+RETENTION_SECONDS = 24 * 3600.0  # finished jobs (and their files) are pruned after this
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    dedup_key TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    params TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    status TEXT NOT NULL,           -- queued | running | done | failed
+    progress REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, created);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+"""
+
+
+class LeaseLost(Exception):
+    """The job was handed to another worker (our lease expired)."""
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class JobQueue:
+    """
+    Persistent job queue in SQLite, shared by the app and worker processes.
+
+    A job is (kind, input file, params, output file). Submitting the same
+    input bytes with the same params returns the existing job instead of
+    queueing a second one. Workers claim jobs with a lease and must renew it
+    (heartbeat) while working; a job whose lease runs out (worker crashed or
+    was killed) is handed to the next worker, up to max_attempts tries.
+    Done and failed jobs are kept for retention_seconds, see prune().
+    """
+
+    def __init__(self, directory=QUEUE_DIR, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 retention_seconds=RETENTION_SECONDS):
+        self.dir = directory
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        os.makedirs(os.path.join(directory, "inputs"), exist_ok=True)
+        os.makedirs(os.path.join(directory, "outputs"), exist_ok=True)
+        self.db_path = os.path.join(directory, "queue.db")
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        # One short-lived connection per call: safe across threads and processes
+        db = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return _Connection(db)
+
+    # --- Producer side ---
+
+    def submit(self, input_bytes, params, kind="studio", version=""):
+        """
+        Queues a job (or finds the identical one already queued/done).
+        version: part of the dedup key, e.g. the pipeline version
+        Output: job id
+        """
+        content = hashlib.sha1(input_bytes).hexdigest()
+        dedup_key = hashlib.sha1(
+            f"{kind}|{content}|{json.dumps(params, sort_keys=True)}|{version}".encode()
+        ).hexdigest()
+        input_path = os.path.join(self.dir, "inputs", content)
+
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            # Under the write lock, so prune() can't delete it before the job row exists
+            if not os.path.exists(input_path):
+                _write_atomic(input_path, input_bytes)
+            row = db.execute("SELECT id, status, output_path FROM jobs WHERE dedup_key = ?",
+                             (dedup_key,)).fetchone()
+            if row is not None:
+                lost = row["status"] == "done" and not os.path.exists(row["output_path"])
+                if row["status"] == "failed" or lost:
+                    # Explicit resubmit of a failed job (or one whose output is
+                    # gone): give it a fresh set of attempts
+                    db.execute("UPDATE jobs SET status = 'queued', attempts = 0, progress = 0, "
+                               "error = NULL, updated = ? WHERE id = ?", (now, row["id"]))
+                db.execute("COMMIT")
+                return row["id"]
+
+            job_id = uuid.uuid4().hex
+            output_path = os.path.join(self.dir, "outputs", f"{dedup_key}.bin")
+            db.execute(
+                "INSERT INTO jobs (id, dedup_key, kind, input_path, params, output_path, status, "
+                "max_attempts, created, updated) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, dedup_key, kind, input_path, json.dumps(params), output_path,
+                 self.max_attempts, now, now)
+            )
+            db.execute("COMMIT")
+            return job_id
+
+    def prune(self, max_age=None):
+        """
+        Deletes done/failed jobs not updated for max_age seconds (default:
+        retention_seconds), their output files and any input file no job
+        refers to any more.
+        Output: number of jobs deleted
+        """
+        cutoff = time.time() - (self.retention_seconds if max_age is None else max_age)
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            rows = db.execute("SELECT id, output_path FROM jobs WHERE status IN ('done', 'failed') "
+                              "AND updated < ?", (cutoff,)).fetchall()
+            db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?", (cutoff,))
+            # Inputs are shared by content: only unreferenced ones go. Still
+            # under the write lock, so no submit can be about to reuse one.
+            used = {row["input_path"] for row in db.execute("SELECT input_path FROM jobs")}
+            inputs = os.path.join(self.dir, "inputs")
+            paths = [row["output_path"] for row in rows]
+            paths += [os.path.join(inputs, name) for name in os.listdir(inputs)
+                      if os.path.join(inputs, name) not in used]
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            db.execute("COMMIT")
+        return len(rows)
+
+    def get(self, job_id):
+        """Output: job dict (params/result decoded) or None."""
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row)
+
+    def read_input(self, job):
+        with open(job["input_path"], "rb") as f:
+            return f.read()
+
+    def read_output(self, job):
+        with open(job["output_path"], "rb") as f:
+            return f.read()
+
+    def stats(self):
+        with self._connect() as db:
+            rows = db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def live_workers(self):
+        with self._connect() as db:
+            row = db.execute("SELECT COUNT(*) AS n FROM workers WHERE last_seen > ?",
+                             (time.time() - WORKER_TIMEOUT,)).fetchone()
+        return row["n"]
+
+    # --- Worker side ---
+
+    def check_in(self, worker_id):
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO workers (id, last_seen) VALUES (?, ?)", (worker_id, time.time()))
+
+    def check_out(self, worker_id):
+        with self._connect() as db:
+            db.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def claim(self, worker_id, kinds=None):
+        """
+        Leases the oldest runnable job: queued, or running with an expired
+        lease (its worker died). Jobs that used up their attempts are marked
+        failed on the way.
+        Output: job dict or None
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            query = ("SELECT * FROM jobs WHERE (status = 'queued' "
+                     "OR (status = 'running' AND lease_expires < ?))")
+            args = [now]
+            if kinds:
+                query += f" AND kind IN ({','.join('?' * len(kinds))})"
+                args += list(kinds)
+            row = db.execute(query + " ORDER BY created LIMIT 1", args).fetchone()
+
+            if row is None:
+                db.execute("COMMIT")
+                return None
+
+            if row["attempts"] >= row["max_attempts"]:
+                db.execute("UPDATE jobs SET status = 'failed', lease_owner = NULL, updated = ?, "
+                           "error = COALESCE(error, 'worker lost ' || attempts || ' time(s)') WHERE id = ?",
+                           (now, row["id"]))
+                db.execute("COMMIT")
+                return self.claim(worker_id, kinds)
+
+            db.execute(
+                "UPDATE jobs SET status = 'running', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, progress = 0, updated = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row["id"])
+            )
+            db.execute("COMMIT")
+        return self.get(row["id"])
+
+    def heartbeat(self, job_id, worker_id, progress=None):
+        """
+        Renews the lease (and records progress).
+        Output: False if the lease was lost (another worker took the job over)
+        """
+        now = time.time()
+        with self._connect() as db:
+            cur = db.execute(
+                "UPDATE jobs SET lease_expires = ?, progress = COALESCE(?, progress), updated = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (now + self.lease_seconds, progress, now, job_id, worker_id)
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job_id, worker_id, output_bytes, result=None):
+        """Writes the output file and marks the job done (if this worker still owns it)."""
+        job = self.get(job_id)
+        if job is None or job["lease_owner"] != worker_id:
+            return False
+        _write_atomic(job["output_path"], output_bytes)
+        now = time.time()
+        with self._connect() as db:
+            cur = db.execute(
+                "UPDATE jobs SET status = 'done', progress = 1, result = ?, error = NULL, "
+                "lease_owner = NULL, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (json.dumps(result or {}), now, job_id, worker_id)
+            )
+            return cur.rowcount == 1
+
+    def fail(self, job_id, worker_id, error):
+        """Puts the job back in the queue, or marks it failed after max_attempts."""
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND lease_owner = ?",
+                (str(error), now, job_id, worker_id)
+            )
+
+
+class _Connection:
+    """sqlite3 connection that is closed (not just committed) by `with`."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, *args):
+        return self.db.execute(*args)
+
+    def executescript(self, script):
+        return self.db.executescript(script)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is not None and self.db.in_transaction:
+            self.db.execute("ROLLBACK")
+        self.db.close()
+
+
+def _job(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+_queue = None
+
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        _queue = JobQueue()
+    return _queue
@@ -0,0 +1,359 @@
+import os
+import time
+import numpy as np
+from ai.image_container import as_rgb
+
+# Semantic landmark groups shared by every backend.
+# "left"/"right" are image left/right, matching gaze_correction.py.
+# *_center groups list the points whose mean is the center.
+GROUPS = [
+    "mouth_corners",
+    "lip_mid",
+    "mouth_center",
+    "nose_tip",
+    "left_eye_corners",
+    "right_eye_corners",
+    "left_eye_contour",
+    "right_eye_contour",
+    "left_eye_center",
+    "right_eye_center",
+    "left_iris",
+    "right_iris",
+]
+
+_BACKENDS = {}
+_instances = {}
+# Filled in by benchmark_backends(); used by pick_backend()
+_measured_ms = {}
+
+# The Studio edits (gaze, smile, face alignment) index MediaPipe's 478-point
+# layout directly, so only backends in that layout qualify
+STUDIO_GROUPS = ["left_iris", "right_iris", "left_eye_contour", "right_eye_contour",
+                 "mouth_corners", "lip_mid"]
+STUDIO_POINTS = 478
+
+
+def register_backend(cls):
+    _BACKENDS[cls.name] = cls
+    return cls
+
+
+def get_backend(name):
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown landmark backend '{name}'. Known: {sorted(_BACKENDS)}")
+    if name not in _instances:
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
+
+
+def list_backends():
+    return sorted(_BACKENDS)
+
+
+def available_backends():
+    return [name for name in list_backends() if _BACKENDS[name].available()]
+
+
+def pick_backend(required_groups):
+    """
+    Returns the name of the fastest available backend providing every group
+    in required_groups. Measured timings win over the static cost hints.
+    """
+    candidates = [
+        name for name in available_backends()
+        if all(get_backend(name).provides(g) for g in required_groups)
+    ]
+    if not candidates:
+        raise ValueError(f"No available landmark backend provides {list(required_groups)}")
+
+    def cost(name):
+        return _measured_ms.get(name, _BACKENDS[name].relative_cost)
+
+    return min(candidates, key=cost)
+
+
+def studio_backend():
+    """
+    Name of the backend the Studio pipeline uses: PP_LANDMARK_BACKEND if set,
+    else the fastest available one with the Studio groups.
+    """
+    name = os.environ.get("PP_LANDMARK_BACKEND") or pick_backend(STUDIO_GROUPS)
+    backend = get_backend(name)
+    if backend.num_points != STUDIO_POINTS or not all(backend.provides(g) for g in STUDIO_GROUPS):
+        raise ValueError(f"Landmark backend '{name}' can't drive the Studio edits "
+                         f"(needs the {STUDIO_POINTS}-point MediaPipe layout)")
+    if not backend.available():
+        raise ValueError(f"Landmark backend '{name}' is not available here")
+    return name
+
+
+class LandmarkBackend:
+    """
+    Interface every backend implements.
+    detect(image) takes a BGR image and returns a list of faces,
+    each face = list of (x, y) pixel coordinates in the backend's own indexing.
+    detect_batch(images) does the same for several images (backends override
+    it when they can share model setup across images).
+    """
+    name = None
+    num_points = 0
+    groups = {}
+    # Rough ms per image, only used until a benchmark has been run
+    relative_cost = 100.0
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def detect(self, image):
+        raise NotImplementedError
+
+    def detect_batch(self, images):
+        return [self.detect(image) for image in images]
+
+    def provides(self, group):
+        return group in self.groups
+
+    def points(self, face, group):
+        indices = self.groups.get(group)
+        if indices is None or max(indices) >= len(face):
+            return None
+        return [face[i] for i in indices]
+
+    def center(self, face, group):
+        pts = self.points(face, group)
+        if pts is None:
+            return None
+        return tuple(np.mean(np.array(pts, dtype=np.float32), axis=0))
+
+
+MEDIAPIPE_478_GROUPS = {
+    "mouth_corners": [61, 291],
+    "lip_mid": [0, 17],
+    "mouth_center": [61, 291],
+    "nose_tip": [1],
+    "left_eye_corners": [33, 133],
+    "right_eye_corners": [362, 263],
+    "left_eye_contour": [33, 246, 161, 160, 159, 158, 157, 173, 133, 155, 154, 153, 145, 144, 163, 7],
+    "right_eye_contour": [362, 398, 384, 385, 386, 387, 388, 466, 263, 249, 390, 373, 374, 380, 381, 382],
+    "left_eye_center": [468],
+    "right_eye_center": [473],
+    "left_iris": [468, 469, 470, 471, 472],
+    "right_iris": [473, 474, 475, 476, 477],
+}
+
+
+@register_backend
+class FaceMeshBackend(LandmarkBackend):
+    """MediaPipe FaceMesh (legacy solutions API), 478 points with iris refinement."""
+    name = "face_mesh"
+    num_points = 478
+    groups = MEDIAPIPE_478_GROUPS
+    relative_cost = 60.0
+
+    @classmethod
+    def available(cls):
+        try:
+            import mediapipe
+        except ImportError:
+            return False
+        # Recent mediapipe releases dropped the legacy solutions API
+        return hasattr(mediapipe, "solutions")
+
+    def detect(self, image):
+        from ai.face_mesh import get_face_landmarks
+        return get_face_landmarks(image)
+
+    def detect_batch(self, images):
+        from ai.face_mesh import get_face_landmarks_batch
+        return get_face_landmarks_batch(images)
+
+
+@register_backend
+class FaceLandmarkerBackend(LandmarkBackend):
+    """MediaPipe Tasks FaceLandmarker with the bundled model, 478 points."""
+    name = "face_landmarker"
+    num_points = 478
+    groups = MEDIAPIPE_478_GROUPS
+    relative_cost = 40.0
+
+    @classmethod
+    def available(cls):
+        from ai.face_landmarker import MODEL_PATH
+        try:
+            import mediapipe  # noqa: F401
+        except ImportError:
+            return False
+        return os.path.exists(MODEL_PATH)
+
+    def detect(self, image):
+        from ai.face_landmarker import get_face_landmarks
+        return get_face_landmarks(image)
+
+
+@register_backend
+class Dlib68Backend(LandmarkBackend):
+    """dlib 68-point shape predictor (ai/face_landmarks.py). No iris points."""
+    name = "dlib68"
+    num_points = 68
+    groups = {
+        "mouth_corners": [48, 54],
+        "lip_mid": [51, 57],
+        "mouth_center": [48, 54],
+        "nose_tip": [30],
+        "left_eye_corners": [36, 39],
+        "right_eye_corners": [42, 45],
+        "left_eye_contour": [36, 37, 38, 39, 40, 41],
+        "right_eye_contour": [42, 43, 44, 45, 46, 47],
+        "left_eye_center": [36, 37, 38, 39, 40, 41],
+        "right_eye_center": [42, 43, 44, 45, 46, 47],
+    }
+    relative_cost = 80.0
+    model_path = "models/shape_predictor_68_face_landmarks.dat"
+
+    @classmethod
+    def available(cls):
+        try:
+            import dlib  # noqa: F401
+        except ImportError:
+            return False
+        return os.path.exists(cls.model_path)
+
+    def detect(self, image):
+        from ai.face_landmarks import get_face_landmarks
+        return get_face_landmarks(image)
+
+
+@register_backend
+class FaceDetectorBackend(LandmarkBackend):
+    """MediaPipe Tasks FaceDetector (BlazeFace): box + 6 keypoints, very cheap."""
+    name = "face_detector"
+    num_points = 6
+    groups = {
+        "left_eye_center": [0],
+        "right_eye_center": [1],
+        "nose_tip": [2],
+        "mouth_center": [3],
+    }
+    relative_cost = 10.0
+    # Not shipped with the repo: see models.txt
+    model_path = os.environ.get("PP_FACE_DETECTOR_MODEL", "models/blaze_face_short_range.tflite")
+
+    def __init__(self):
+        self._detector = None
+
+    @classmethod
+    def available(cls):
+        try:
+            import mediapipe  # noqa: F401
+        except ImportError:
+            return False
+        return os.path.exists(cls.model_path)
+
+    def _get_detector(self):
+        if self._detector is None:
+            from mediapipe.tasks import python
+            from mediapipe.tasks.python import vision
+
+            options = vision.FaceDetectorOptions(
+                base_options=python.BaseOptions(model_asset_path=self.model_path),
+                min_detection_confidence=0.3
+            )
+            self._detector = vision.FaceDetector.create_from_options(options)
+        return self._detector
+
+    def detect(self, image):
+        import mediapipe as mp
+
+        h, w = image.shape[:2]
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=as_rgb(image))
+        result = self._get_detector().detect(mp_image)
+
+        faces = []
+        for detection in result.detections:
+            faces.append([(int(kp.x * w), int(kp.y * h)) for kp in detection.keypoints])
+        return faces
+
+
+# --- Benchmark ---
+
+ACCURACY_GROUPS = ["left_eye_center", "right_eye_center", "nose_tip", "mouth_center"]
+
+
+def _anchor_points(backend, face):
+    pts = [backend.center(face, g) for g in ACCURACY_GROUPS]
+    if any(p is None for p in pts):
+        return None
+    return np.array(pts, dtype=np.float32)
+
+
+def _normalized_error(backend, faces, ref_backend, ref_faces):
+    """
+    Mean error of the shared anchor points against the reference backend,
+    normalized by the reference inter-ocular distance (NME).
+    Faces are matched to the nearest reference face.
+    """
+    ref_anchors = [a for a in (_anchor_points(ref_backend, f) for f in ref_faces) if a is not None]
+    if not ref_anchors:
+        return []
+
+    errors = []
+    for face in faces:
+        anchors = _anchor_points(backend, face)
+        if anchors is None:
+            continue
+        ref = min(ref_anchors, key=lambda r: np.linalg.norm(r.mean(axis=0) - anchors.mean(axis=0)))
+        iod = np.linalg.norm(ref[0] - ref[1])
+        if iod < 1:
+            continue
+        errors.append(float(np.mean(np.linalg.norm(anchors - ref, axis=1)) / iod))
+    return errors
+
+
+def benchmark_backends(images, reference="face_mesh", backends=None, repeats=1):
+    """
+    Runs every available backend over images (list of BGR arrays).
+    Returns {name: {"ms_per_image", "faces", "nme", "groups"}}.
+    Accuracy is measured against the reference backend's anchor points,
+    so the reference itself reports nme 0. A backend that raises is
+    reported with an "error" entry instead of aborting the run.
+    """
+    names = backends or available_backends()
+    report = {}
+    outputs = {}
+
+    for name in names:
+        backend = get_backend(name)
+        try:
+            backend.detect(images[0])  # warm-up (model load)
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                faces_per_image = [backend.detect(img) for img in images]
+            elapsed = (time.perf_counter() - start) * 1000 / (repeats * len(images))
+        except Exception as e:
+            # One broken backend shouldn't cost the report for the others
+            print(f"Landmark backend '{name}' failed: {type(e).__name__}: {e}")
+            report[name] = {"ms_per_image": float("inf"), "faces": 0, "nme": None,
+                            "groups": sorted(backend.groups), "error": str(e)}
+            continue
+
+        _measured_ms[name] = elapsed
+        outputs[name] = faces_per_image
+        report[name] = {
+            "ms_per_image": elapsed,
+            "faces": sum(len(f) for f in faces_per_image),
+            "nme": None,
+            "groups": sorted(backend.groups),
+        }
+
+    if reference in outputs:
+        ref_backend = get_backend(reference)
+        for name in outputs:
+            backend = get_backend(name)
+            errors = []
+            for faces, ref_faces in zip(outputs[name], outputs[reference]):
+                errors.extend(_normalized_error(backend, faces, ref_backend, ref_faces))
+            report[name]["nme"] = float(np.mean(errors)) if errors else None
+
+    return report
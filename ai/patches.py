@@ -0,0 +1,111 @@
+import json
+import struct
+import cv2
+import numpy as np
+
+MAGIC = b"PPP1"
+
+
+class PatchedImage:
+    """
+    An edit result stored as the original frame plus a list of
+    ((x1, y1, x2, y2), patch) deltas. Face edits only touch small eye and
+    mouth regions, so this is far smaller than a second full frame.
+    The full image is only built by render().
+    degradations: quality shortcuts taken to meet a latency budget (ai/budget.py).
+    """
+
+    def __init__(self, original, patches=None, degradations=None):
+        self.original = original
+        self.patches = list(patches or [])
+        self.degradations = list(degradations or [])
+
+    @classmethod
+    def from_diff(cls, original, edited, pad=4):
+        """Collects every region where edited differs from original."""
+        if original.shape != edited.shape:
+            raise ValueError("original and edited must have the same shape")
+
+        diff = cv2.absdiff(original, edited)
+        if diff.ndim == 3:
+            # Per-channel max via cv2 (numpy's axis reduce is ~10x slower here)
+            channels = cv2.split(diff)
+            diff = channels[0]
+            for c in channels[1:]:
+                diff = cv2.max(diff, c)
+        if cv2.countNonZero(diff) == 0:
+            return cls(original)
+        _, changed = cv2.threshold(diff, 0, 1, cv2.THRESH_BINARY)
+
+        # Merge nearby changes (e.g. the two halves of a warped iris)
+        changed = cv2.dilate(changed, np.ones((2 * pad + 1, 2 * pad + 1), np.uint8))
+        n, _, stats, _ = cv2.connectedComponentsWithStats(changed, connectivity=8)
+
+        h, w = original.shape[:2]
+        patches = []
+        for x, y, bw, bh, _ in stats[1:n]:
+            x1, y1 = max(0, x), max(0, y)
+            x2, y2 = min(w, x + bw), min(h, y + bh)
+            patches.append(((int(x1), int(y1), int(x2), int(y2)), edited[y1:y2, x1:x2].copy()))
+        return cls(original, patches)
+
+    @property
+    def shape(self):
+        return self.original.shape
+
+    @property
+    def patch_nbytes(self):
+        return sum(p.nbytes for _, p in self.patches)
+
+    def render(self):
+        out = self.original.copy()
+        for (x1, y1, x2, y2), patch in self.patches:
+            out[y1:y2, x1:x2] = patch
+        return out
+
+    def to_bytes(self):
+        """
+        Compact form of the patches only (the original is stored separately):
+        MAGIC | header length | JSON header | PNG-encoded patches
+        """
+        return encode_patches(self.patches, self.original.shape, self.degradations)
+
+    @classmethod
+    def from_bytes(cls, data, original):
+        patches, header = decode_patches(data)
+        if list(original.shape) != header["shape"]:
+            raise ValueError("Patches were made for a different image size")
+        return cls(original, patches, header.get("degradations"))
+
+
+def encode_patches(patches, shape=None, degradations=()):
+    """Serializes a bare patch list (see PatchedImage.to_bytes); shape is the image's, if known."""
+    blobs = []
+    entries = []
+    for bbox, patch in patches:
+        ok, buf = cv2.imencode(".png", patch)
+        if not ok:
+            raise ValueError("Could not encode patch")
+        blobs.append(buf.tobytes())
+        entries.append({"bbox": list(bbox), "size": len(blobs[-1])})
+
+    header = json.dumps({"shape": list(shape) if shape is not None else None, "patches": entries,
+                         "degradations": list(degradations)}).encode()
+    return MAGIC + struct.pack("<I", len(header)) + header + b"".join(blobs)
+
+
+def decode_patches(data):
+    """Output: (patch list, header dict) from encode_patches bytes."""
+    if data[:4] != MAGIC:
+        raise ValueError("Not a patch file")
+    (header_len,) = struct.unpack("<I", data[4:8])
+    header = json.loads(data[8:8 + header_len])
+
+    patches = []
+    offset = 8 + header_len
+    for entry in header["patches"]:
+        blob = np.frombuffer(data[offset:offset + entry["size"]], dtype=np.uint8)
+        offset += entry["size"]
+        patch = cv2.imdecode(blob, cv2.IMREAD_UNCHANGED)
+        patches.append((tuple(entry["bbox"]), patch))
+    return patches, header
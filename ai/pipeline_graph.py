@@ -0,0 +1,113 @@
+import hashlib
+import time
+from ai.cache import LRUCache
+from ai.profiling import stage
+
+
+class Node:
+    def __init__(self, name, fn, deps=(), params=(), wants_progress=False, max_items=32, store=None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.params = tuple(params)
+        self.wants_progress = wants_progress
+        self.cache = LRUCache(max_items=max_items)
+        # Optional second level shared between processes: get(key) / put(key, value)
+        self.store = store
+
+
+class PipelineGraph:
+    """
+    Small dependency graph with per-node memoization.
+
+    Each node's cache key is a hash of its name, the parameters it declares
+    and the keys of its dependencies, so changing one parameter only
+    invalidates the nodes downstream of where it is used. Nodes must be
+    added after their dependencies (insertion order is the run order).
+    """
+
+    def __init__(self):
+        self.nodes = {}
+
+    def source(self, name):
+        """A node whose value is always supplied through run(seed=...)."""
+        self.nodes[name] = Node(name, None)
+        return self
+
+    def add(self, name, fn, deps=(), params=(), wants_progress=False, max_items=32, store=None):
+        """
+        max_items: in-process memo size for this node
+        store: optional shared cache (get(key) -> value or None, put(key, value)),
+        checked after the in-process memo, so other processes' results are reused
+        """
+        for dep in deps:
+            if dep not in self.nodes:
+                raise ValueError(f"Node '{name}' depends on unknown node '{dep}'")
+        self.nodes[name] = Node(name, fn, deps, params, wants_progress, max_items, store)
+        return self
+
+    def _needed(self, targets, seeded):
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name in needed:
+                continue
+            needed.add(name)
+            if name not in seeded:
+                stack.extend(self.nodes[name].deps)
+        return [name for name in self.nodes if name in needed]
+
+    def run(self, targets, seed, params, progress=None):
+        """
+        targets: node names to compute
+        seed: {node name: (value, key)} for values supplied from outside
+        params: {param name: value}
+        progress: optional callback(fraction); it may raise to abort
+        Output: ({node name: value}, {node name: {"ms": float, "cached": bool}})
+        """
+        values = {name: value for name, (value, _) in seed.items()}
+        keys = {name: key for name, (_, key) in seed.items()}
+        timings = {}
+
+        order = [name for name in self._needed(targets, seed) if name not in seed]
+        for name in order:
+            if self.nodes[name].fn is None:
+                raise ValueError(f"Source '{name}' was not seeded")
+        for i, name in enumerate(order):
+            node = self.nodes[name]
+            h = hashlib.sha1(name.encode())
+            for p in node.params:
+                h.update(f"|{p}={params[p]!r}".encode())
+            for dep in node.deps:
+                h.update(f"|{dep}:{keys[dep]}".encode())
+            key = h.hexdigest()
+            keys[name] = key
+
+            start = time.perf_counter()
+            cached = node.cache.get(key)
+            if cached is None and node.store is not None:
+                cached = node.store.get(key)
+                if cached is not None:
+                    node.cache.put(key, cached)
+            if cached is not None:
+                values[name] = cached
+            else:
+                kwargs = {p: params[p] for p in node.params}
+                if node.wants_progress and progress:
+                    kwargs["progress"] = lambda f, i=i: progress((i + f) / len(order))
+                with stage(name):
+                    values[name] = node.fn(*[values[d] for d in node.deps], **kwargs)
+                node.cache.put(key, values[name])
+                if node.store is not None:
+                    node.store.put(key, values[name])
+            timings[name] = {"ms": (time.perf_counter() - start) * 1000, "cached": cached is not None}
+
+            if progress:
+                progress((i + 1) / len(order))
+
+        return {name: values[name] for name in targets}, timings
+
+    def clear(self):
+        for node in self.nodes.values():
+            node.cache.clear()
@@ -1,11 +1,23 @@
 from ai.face_crop import crop_face
-from ai.expression_detect import detect_expression
-from ai.expression_edit import edit_expression
+from ai.expression_edit import edit_expressions
 from ai.face_paste import paste_face
 
-def process_image(image, faces, target_expression):
+def process_image(image, faces, target_expression, seed=0, steps=None, size=None):
+    crops = []
+    coords = []
     for face_bbox in faces:
-        face_img, coords = crop_face(image, face_bbox)
-        edited_face = edit_expression(face_img, target_expression)
-        image = paste_face(image, edited_face, coords)
+        face_img, face_coords = crop_face(image, face_bbox)
+        if face_img.size == 0:
+            continue
+        crops.append(face_img)
+        coords.append(face_coords)
+
+    if not crops:
+        return image
+
+    # All faces of the photo go through the diffusion pipeline as one batch
+    edited_faces = edit_expressions(crops, target_expression, seed=seed, steps=steps, size=size)
+
+    for edited_face, face_coords in zip(edited_faces, coords):
+        image = paste_face(image, edited_face, face_coords)
     return image
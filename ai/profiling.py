@@ -0,0 +1,208 @@
+import contextlib
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# Per-request profiling. Enable with PP_PROFILE=cprofile|sample (or "1" for
+# cprofile), ?profile=... in the app URL, or `python main.py --profile`.
+# When no run is active, stage() returns a shared no-op context manager.
+PROFILE_ENV = "PP_PROFILE"
+PROFILE_DIR = os.environ.get("PP_PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = 0.005
+TOP_N = 15
+
+_current = contextvars.ContextVar("pp_profile", default=None)
+_NOOP = contextlib.nullcontext()
+
+
+def requested_mode(value=None):
+    """Normalizes a flag/env value to 'cprofile', 'sample' or None."""
+    if value is None:
+        value = os.environ.get(PROFILE_ENV, "")
+    value = str(value).strip().lower()
+    if value in ("", "0", "false", "off", "no"):
+        return None
+    if value in ("sample", "sampling"):
+        return "sample"
+    return "cprofile"
+
+
+def stage(name):
+    session = _current.get()
+    if session is None:
+        return _NOOP
+    return session.stage(name)
+
+
+@contextlib.contextmanager
+def profile_run(name, mode=None, out_dir=PROFILE_DIR):
+    """
+    Profiles everything inside the block when mode (or PP_PROFILE) is set.
+    Yields the ProfileSession, or None when profiling is off.
+    """
+    mode = requested_mode(mode)
+    if mode is None:
+        yield None
+        return
+
+    session = ProfileSession(name, mode)
+    token = _current.set(session)
+    session.start()
+    try:
+        yield session
+    finally:
+        session.stop()
+        _current.reset(token)
+        session.write(out_dir)
+
+
+class _Sampler:
+    """Samples one thread's Python stack into flamegraph 'collapsed' stacks."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="pp-sampler")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class ProfileSession:
+    def __init__(self, name, mode):
+        self.name = name
+        self.mode = mode
+        self.stages = {}
+        self.summary = ""
+        self.files = []
+        self._stack = []
+        self._own_tracemalloc = False
+        self._profiler = None
+        self._sampler = None
+        self._start = None
+        self.elapsed = 0.0
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+        if self.mode == "sample":
+            self._sampler = _Sampler(threading.get_ident())
+            self._sampler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._start = time.perf_counter()
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self._start
+        if self._profiler:
+            self._profiler.disable()
+        if self._sampler:
+            self._sampler.stop()
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        # reset_peak() would lose the parent's peak so far; fold it in first
+        if self._stack:
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        entry = {"name": name, "peak": 0, "start": time.perf_counter()}
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            entry["peak"] = max(entry["peak"], tracemalloc.get_traced_memory()[1])
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], entry["peak"])
+
+            row = self.stages.setdefault(name, {"calls": 0, "ms": 0.0, "peak": 0})
+            row["calls"] += 1
+            row["ms"] += (time.perf_counter() - entry["start"]) * 1000
+            row["peak"] = max(row["peak"], entry["peak"])
+
+    def _hot_functions_cprofile(self):
+        stats = pstats.Stats(self._profiler)
+        rows = sorted(stats.stats.items(), key=lambda kv: kv[1][2], reverse=True)[:TOP_N]
+        lines = [f"{'self ms':>9}{'cum ms':>10}{'calls':>8}  function  <- top caller"]
+        for func, (cc, nc, tt, ct, callers) in rows:
+            caller = ""
+            if callers:
+                top = max(callers.items(), key=lambda kv: kv[1][3] if isinstance(kv[1], tuple) else 0)[0]
+                caller = f"  <- {pstats.func_std_string(top)}"
+            lines.append(f"{tt * 1000:>9.1f}{ct * 1000:>10.1f}{nc:>8}  {pstats.func_std_string(func)}{caller}")
+        return lines
+
+    def _hot_functions_sample(self):
+        stacks = self._sampler.stacks
+        total = sum(stacks.values()) or 1
+        leaf = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(";")
+            # "leaf <- caller" names e.g. the Python line that called cv2.inpaint
+            leaf[" <- ".join(reversed(frames[-2:]))] += count
+        lines = [f"{'samples':>9}{'%':>7}  frame <- caller"]
+        for name, count in leaf.most_common(TOP_N):
+            lines.append(f"{count:>9}{100.0 * count / total:>7.1f}  {name}")
+        return lines
+
+    def write(self, out_dir):
+        os.makedirs(out_dir, exist_ok=True)
+        base = os.path.join(out_dir, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+        if self._profiler:
+            # pstats dump: open with snakeviz, or flameprof for a flamegraph
+            self._profiler.dump_stats(base + ".prof")
+            self.files.append(base + ".prof")
+            hot = self._hot_functions_cprofile()
+        else:
+            # Collapsed stacks: flamegraph.pl / speedscope / inferno
+            with open(base + ".folded", "w") as f:
+                for stack, count in self._sampler.stacks.items():
+                    f.write(f"{stack} {count}\n")
+            self.files.append(base + ".folded")
+            hot = self._hot_functions_sample()
+
+        out = io.StringIO()
+        out.write(f"{self.name}: {self.elapsed * 1000:.0f} ms ({self.mode})\n\n")
+        out.write(f"{'stage':<20}{'calls':>6}{'ms':>10}{'peak MB':>10}\n")
+        for name, row in self.stages.items():
+            out.write(f"{name:<20}{row['calls']:>6}{row['ms']:>10.1f}{row['peak'] / 1024 / 1024:>10.1f}\n")
+        out.write("\nHot functions:\n")
+        out.write("\n".join(hot) + "\n")
+        self.summary = out.getvalue()
+
+        with open(base + ".txt", "w") as f:
+            f.write(self.summary)
+        self.files.append(base + ".txt")
+
+        # Keep only the summary around (sessions may be stored in UI state)
+        self._profiler = None
+        self._sampler = None
@@ -1,20 +1,22 @@
 import cv2
 import numpy as np
+from ai.landmark_backends import get_backend
 
-def enhance_smile(image, landmarks, intensity=6):
+def enhance_smile(image, landmarks, intensity=6, backend="dlib68"):
     """
     image: original image (BGR)
     landmarks: list of (x, y) for one face
     intensity: how strong the smile is
+    backend: landmark backend that produced the points (decides the indices)
     """
 
     img = image.copy()
 
-    LEFT = 25
-    RIGHT = 29
+    corners = get_backend(backend).points(landmarks, "mouth_corners")
+    if corners is None:
+        return img
 
-    left_x, left_y = landmarks[LEFT]
-    right_x, right_y = landmarks[RIGHT]
+    (left_x, left_y), (right_x, right_y) = corners
 
     new_left = (left_x, left_y - intensity)
     new_right = (right_x, right_y - intensity)
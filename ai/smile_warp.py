@@ -1,5 +1,6 @@
 import cv2
 import numpy as np
+from ai.compositing import blend, ellipse_mask, feather_ellipse
 
 # MediaPipe Face Mesh indices
 LEFT = 61   # Left corner of mouth
@@ -7,7 +8,13 @@ RIGHT = 291 # Right corner of mouth
 UPPER_LIP = 0 # Upper lip top (midterm)
 LOWER_LIP = 17 # Lower lip bottom (midterm)
 
-def warp_smile(image, landmarks, intensity=6):
+def warp_smile(image, landmarks, intensity=6, blend_mode="seamless", scale=1.0):
+    """
+    blend_mode: "seamless" (Poisson seamlessClone) or "feather" (a much
+    cheaper feathered alpha blend, used when the latency budget is tight)
+    scale: face size relative to 64 px between the eyes; multiplies the
+    pixel sizes below (band, padding, lift)
+    """
     img = image.copy()
 
     lx, ly = landmarks[LEFT]
@@ -23,8 +30,8 @@ def warp_smile(image, landmarks, intensity=6):
     # cy is midpoint between upper and lower lip vertical extents
     cy = (uy + dy) // 2
 
-    w = abs(rx - lx) + 20
-    h = 40
+    w = abs(rx - lx) + int(20 * scale)
+    h = int(40 * scale)
 
     x1 = max(0, cx - w // 2)
     x2 = min(img.shape[1], cx + w // 2)
@@ -57,7 +64,7 @@ def warp_smile(image, landmarks, intensity=6):
             t = (x - left_x) / (right_x - left_x)
             influence[:, x] = np.sin(np.pi * t)
 
-    map_y = map_y.astype(np.float32) - influence * intensity
+    map_y = map_y.astype(np.float32) - influence * (intensity * scale)
 
     warped = cv2.remap(
         roi,
@@ -67,15 +74,13 @@ def warp_smile(image, landmarks, intensity=6):
         borderMode=cv2.BORDER_REFLECT
     )
 
-    mask = np.zeros(roi.shape, dtype=np.uint8)
-    cv2.ellipse(
-        mask,
-        (roi_w // 2, roi_h // 2),
-        (roi_w // 2, roi_h // 2),
-        0, 0, 360,
-        (255, 255, 255),
-        -1
-    )
+    if blend_mode == "feather":
+        img[y1:y2, x1:x2] = blend(roi, warped, feather_ellipse(roi_h, roi_w, int(round(4 * scale))))
+        return img
+
+    # Single-channel ellipse, cached per ROI size. seamlessClone writes into
+    # a single-channel mask, so it gets its own copy.
+    mask = ellipse_mask(roi_h, roi_w).copy()
 
     center = (cx, cy)
     img = cv2.seamlessClone(
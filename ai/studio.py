@@ -0,0 +1,255 @@
+import json
+import os
+import re
+import struct
+import time
+import cv2
+import numpy as np
+from ai.budget import FULL_QUALITY, plan
+from ai.cache import TieredCache, image_hash
+from ai.face_align import edit_aligned
+from ai.landmark_backends import get_backend, studio_backend
+from ai.smile_warp import warp_smile
+from ai.gaze_correction import correct_gaze
+from ai.image_container import as_bgr, as_frame
+from ai.patches import PatchedImage, decode_patches, encode_patches
+from ai.pipeline_graph import PipelineGraph
+from ai.profiling import stage
+
+# Bump whenever gaze/smile output changes; cached results of other
+# versions are dropped automatically.
+PIPELINE_VERSION = "3"
+RESULT_CACHE_DIR = os.environ.get("PP_CACHE_DIR", ".cache/results")
+RESULT_CACHE_BYTES = int(os.environ.get("PP_CACHE_MB", 512)) * 1024 * 1024
+# Landmarks and gaze patches per (image, params), shared by the app and every
+# pool worker: a slider move rarely lands on the worker that ran the last one
+STAGE_CACHE_DIR = os.environ.get("PP_STAGE_CACHE_DIR", ".cache/stages")
+STAGE_CACHE_BYTES = int(os.environ.get("PP_STAGE_CACHE_MB", 128)) * 1024 * 1024
+# In-process node memo: a few slider positions for each active session
+ACTIVE_SESSIONS = int(os.environ.get("PP_ACTIVE_SESSIONS", 16))
+STAGE_MEMO_ITEMS = 4 * ACTIVE_SESSIONS
+
+_result_cache = None
+_stage_cache = None
+_landmark_backend = None
+
+
+def decode_image(image_bytes):
+    with stage("decode"):
+        file_bytes = np.frombuffer(image_bytes, dtype=np.uint8)
+        image = cv2.imdecode(file_bytes, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image")
+    return image
+
+
+def landmark_backend():
+    """The Studio's landmark backend (PP_LANDMARK_BACKEND, else picked once per process)."""
+    global _landmark_backend
+    if _landmark_backend is None:
+        _landmark_backend = studio_backend()
+    return _landmark_backend
+
+
+def _landmarks(image, landmark_backend):
+    return get_backend(landmark_backend).detect(image)
+
+
+def _gaze(frame, faces, gaze_intensity, skip_faces=(), iris_fill="telea", progress=None):
+    if len(skip_faces) >= len(faces):
+        return []  # nothing to edit: skip the full-frame copy and diff
+    image = frame.bgr()
+    output_image = image.copy()
+    for i, face in enumerate(faces):
+        if progress:
+            progress(i / len(faces))
+        if i in skip_faces:
+            continue
+        # Edited in an upright chip of bounded size, only the changed pixels come back
+        edit_aligned(output_image, face,
+                     lambda chip, lm, scale: correct_gaze(chip, lm, intensity=gaze_intensity, fill=iris_fill,
+                                                          scale=scale), copy=False)
+    # Nodes cache bare patch lists: no full frames, and no references to the
+    # caller's buffer (which may be a shared-memory view)
+    return PatchedImage.from_diff(image, output_image).patches
+
+
+def _smile(frame, gaze_patches, faces, smile_intensity, skip_faces=(), smile_blend="seamless", progress=None):
+    if len(skip_faces) >= len(faces):
+        return gaze_patches
+    image = frame.bgr()
+    output_image = PatchedImage(image, gaze_patches).render()
+    for i, face in enumerate(faces):
+        if progress:
+            progress(i / len(faces))
+        if i in skip_faces:
+            continue
+        edit_aligned(output_image, face,
+                     lambda chip, lm, scale: warp_smile(chip, lm, intensity=smile_intensity, blend_mode=smile_blend,
+                                                        scale=scale), copy=False)
+    return PatchedImage.from_diff(image, output_image).patches
+
+
+def _older_version(name):
+    # Only our own v<N> namespaces, and only older ones: during a deploy
+    # processes of the new version may already be writing theirs
+    m = re.fullmatch(r"v(\d+)", name)
+    return m is not None and int(m.group(1)) < int(PIPELINE_VERSION)
+
+
+def get_stage_cache():
+    global _stage_cache
+    if _stage_cache is None:
+        _stage_cache = TieredCache(STAGE_CACHE_DIR, namespace=f"v{PIPELINE_VERSION}",
+                                   max_items=STAGE_MEMO_ITEMS, max_bytes=STAGE_CACHE_BYTES,
+                                   stale=_older_version)
+    return _stage_cache
+
+
+class StageStore:
+    """Node outputs in the cross-process stage cache, (de)serialized with pack/unpack."""
+
+    def __init__(self, prefix, pack, unpack):
+        self.prefix = prefix
+        self.pack = pack
+        self.unpack = unpack
+
+    def get(self, key):
+        data = get_stage_cache().get(f"{self.prefix}|{key}")
+        return None if data is None else self.unpack(data)
+
+    def put(self, key, value):
+        get_stage_cache().put(f"{self.prefix}|{key}", self.pack(value))
+
+
+def _pack_faces(faces):
+    return json.dumps([[list(p) for p in face] for face in faces]).encode()
+
+
+def _unpack_faces(data):
+    return [[tuple(p) for p in face] for face in json.loads(data)]
+
+
+def build_studio_graph():
+    """
+    image -> landmarks -> gaze (all faces) -> smile (all faces)
+    A smile-only change reuses landmarks and the gaze-corrected frame;
+    a gaze change reuses landmarks. Landmarks and gaze patches are also kept
+    in the stage cache, so this works whichever pool worker gets the job.
+    (The smile output is the final result, which enhance_cached stores.)
+    """
+    graph = PipelineGraph()
+    graph.source("image")
+    graph.add("landmarks", _landmarks, deps=["image"], params=["landmark_backend"], max_items=STAGE_MEMO_ITEMS,
+              store=StageStore("landmarks", _pack_faces, _unpack_faces))
+    graph.add("gaze", _gaze, deps=["image", "landmarks"],
+              params=["gaze_intensity", "skip_faces", "iris_fill"], wants_progress=True,
+              max_items=STAGE_MEMO_ITEMS,
+              store=StageStore("gaze", encode_patches, lambda data: decode_patches(data)[0]))
+    graph.add("smile", _smile, deps=["image", "gaze", "landmarks"],
+              params=["smile_intensity", "skip_faces", "smile_blend"], wants_progress=True,
+              max_items=STAGE_MEMO_ITEMS)
+    return graph
+
+
+_studio_graph = None
+
+
+def get_studio_graph():
+    global _studio_graph
+    if _studio_graph is None:
+        _studio_graph = build_studio_graph()
+    return _studio_graph
+
+
+def clear_stage_caches():
+    """Forgets every node output, in this process and on disk (for cold-run benchmarks)."""
+    get_studio_graph().clear()
+    get_stage_cache().clear()
+
+
+def enhance_image(image, smile_intensity, gaze_intensity, progress=None, timings=None, budget_ms=None,
+                  image_key=None):
+    """
+    The Studio pipeline, run through the memoized stage graph.
+    image: BGR ndarray or Frame (its RGB view is reused by the landmarker)
+    progress: optional callback(fraction in [0, 1]); it may raise to abort
+    timings: optional dict, filled with per-node {"ms", "cached"}
+    budget_ms: optional latency budget; once the faces are known, cheaper
+    edit variants are picked to fit (see ai/budget.py)
+    image_key: image_hash of the pixels, if the caller already has it
+    Output: (PatchedImage of the edits, faces); result.degradations lists
+    any shortcuts taken
+    """
+    start = time.perf_counter()
+    frame = as_frame(image)
+    graph = get_studio_graph()
+    seed = {"image": (frame, image_key or image_hash(frame.bgr()))}
+    params = {"smile_intensity": float(smile_intensity), "gaze_intensity": float(gaze_intensity),
+              "landmark_backend": landmark_backend(), **FULL_QUALITY}
+    node_timings = {}
+    degradations = []
+
+    if budget_ms is not None:
+        outputs, node_timings = graph.run(targets=["landmarks"], seed=seed, params=params)
+        spent = (time.perf_counter() - start) * 1000
+        budget_plan = plan(frame.shape, outputs["landmarks"], budget_ms - spent)
+        params.update(budget_plan.params)
+        degradations = budget_plan.degradations
+
+    outputs, edit_timings = graph.run(targets=["smile", "landmarks"], seed=seed, params=params, progress=progress)
+    if timings is not None:
+        timings.update({**edit_timings, **node_timings})
+    return PatchedImage(frame.bgr(), outputs["smile"], degradations), outputs["landmarks"]
+
+
+def get_result_cache():
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = TieredCache(RESULT_CACHE_DIR, namespace=f"v{PIPELINE_VERSION}",
+                                    max_bytes=RESULT_CACHE_BYTES, stale=_older_version)
+    return _result_cache
+
+
+def result_key(image, smile_intensity, gaze_intensity, image_key=None):
+    # Keyed by decoded pixels so re-encoded copies of one photo still hit
+    # Different landmark backends give (slightly) different edits
+    return (f"{image_key or image_hash(image)}|smile={float(smile_intensity):.4f}|gaze={float(gaze_intensity):.4f}"
+            f"|lm={landmark_backend()}|v{PIPELINE_VERSION}")
+
+
+def _pack(result, faces):
+    faces_json = _pack_faces(faces)
+    return struct.pack("<I", len(faces_json)) + faces_json + result.to_bytes()
+
+
+def _unpack(data, image):
+    (n,) = struct.unpack("<I", data[:4])
+    faces = _unpack_faces(data[4:4 + n])
+    return PatchedImage.from_bytes(data[4 + n:], image), faces
+
+
+def enhance_cached(image, smile_intensity, gaze_intensity, compute=enhance_image, budget_ms=None):
+    """
+    enhance_image() memoized across sessions by (pixels, intensities, version).
+    compute: what to run on a miss, e.g. the process-pool path; called as
+    compute(image, smile, gaze, budget_ms=budget_ms, image_key=...), where
+    image_key is the pixel hash (hashing a 100 MP frame twice is not free)
+    A full-quality result is served for any budget; degraded results are
+    only reused for the same budget.
+    Output: (PatchedImage, faces, hit)
+    """
+    cache = get_result_cache()
+    image_key = image_hash(as_bgr(image))
+    key = result_key(image, smile_intensity, gaze_intensity, image_key=image_key)
+    budget_key = f"{key}|budget={int(budget_ms)}" if budget_ms is not None else None
+
+    for k in filter(None, [key, budget_key]):
+        data = cache.get(k)
+        if data is not None:
+            result, faces = _unpack(data, as_bgr(image))
+            return result, faces, True
+
+    result, faces = compute(image, smile_intensity, gaze_intensity, budget_ms=budget_ms, image_key=image_key)
+    cache.put(budget_key if result.degradations else key, _pack(result, faces))
+    return result, faces, False
@@ -0,0 +1,212 @@
+import os
+import struct
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+import numpy as np
+
+# Studio enhancement runs in a shared pool of pre-warmed worker processes so
+# one large photo doesn't hold the GIL for every other session.
+# Images travel through shared memory laid out as:
+#   [0:8] float64 progress | [8] cancel flag | [16:] pixels
+HEADER_SIZE = 16
+NUM_WORKERS = int(os.environ.get("PP_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+# A job whose worker died (OOM kill on a huge upload, native crash) is run
+# once more on a fresh pool
+JOB_RETRIES = 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _attach(name):
+    # Only the creating process owns (and unlinks) the segment. Before 3.13
+    # attaching also registers it, but spawned workers share the parent's
+    # resource tracker, where that registration is a no-op.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _warm_up():
+    # Load models once per worker, not on the first user's request.
+    # A failure here must not break the pool; the job will report it.
+    try:
+        from ai.landmark_backends import get_backend
+        from ai.studio import get_studio_graph, landmark_backend
+        get_studio_graph()
+        get_backend(landmark_backend()).detect(np.zeros((64, 64, 3), dtype=np.uint8))
+    except Exception as e:
+        print(f"Worker warm-up failed: {e}")
+
+
+def _ping():
+    return os.getpid()
+
+
+def _run_job(shm_name, shape, dtype, smile_intensity, gaze_intensity, budget_ms=None, image_key=None):
+    from ai.studio import enhance_image
+
+    shm = _attach(shm_name)
+    image = result = None
+    try:
+        def progress(fraction):
+            if shm.buf[8]:
+                raise JobCancelled()
+            struct.pack_into("<d", shm.buf, 0, fraction)
+
+        image = np.ndarray(shape, dtype=dtype, buffer=shm.buf[HEADER_SIZE:])
+        timings = {}
+        result, faces = enhance_image(image, smile_intensity, gaze_intensity,
+                                      progress=progress, timings=timings, budget_ms=budget_ms,
+                                      image_key=image_key)
+        # Patches are copies, so they outlive the segment
+        return result.patches, faces, timings, result.degradations
+    finally:
+        # Drop every view of the segment before closing it
+        image = result = None
+        try:
+            shm.close()
+        except BufferError:
+            # A traceback still references a view; the parent unlinks the
+            # segment, and the mapping goes away with that reference
+            pass
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and getattr(_pool, "_broken", False):
+            # A worker died: the executor refuses all work from now on
+            _discard(_pool)
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=NUM_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up
+            )
+            # Workers start lazily; ping them so they warm up before real jobs
+            for _ in range(NUM_WORKERS):
+                _pool.submit(_ping)
+        return _pool
+
+
+def _discard(pool):
+    # Caller holds _pool_lock
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def submit(fn, *args):
+    """pool.submit on the shared pool, replacing it first if a worker death broke it."""
+    pool = get_pool()
+    try:
+        return pool.submit(fn, *args)
+    except BrokenProcessPool:
+        with _pool_lock:
+            _discard(pool)
+        return get_pool().submit(fn, *args)
+
+
+class EnhanceJob:
+    """
+    One Studio enhancement submitted to the pool.
+    progress: latest reported fraction, cancel(): stop at the next face,
+    result(): (PatchedImage, faces) built on the caller's copy of the image,
+    timings: per-stage timings from the worker once result() has returned.
+    budget_ms: latency budget for the work in the worker (queueing not included).
+    image_key: image_hash of the pixels if already known (saves the worker a hash).
+    If the worker dies mid-job, the job is resubmitted (JOB_RETRIES times) on
+    a fresh shared pool; with an explicit pool it just fails.
+    """
+
+    def __init__(self, image, smile_intensity, gaze_intensity, pool=None, budget_ms=None, image_key=None):
+        self.image = image
+        self.timings = {}
+        self._released = False
+        self._finished = threading.Event()
+        self._lock = threading.Lock()
+        self._pool = pool
+        self._retries = JOB_RETRIES
+
+        self._shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + image.nbytes)
+        try:
+            self._shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+            shared = np.ndarray(image.shape, dtype=image.dtype, buffer=self._shm.buf[HEADER_SIZE:])
+            shared[:] = image
+            del shared
+
+            self._args = (_run_job, self._shm.name, image.shape, image.dtype.str,
+                          smile_intensity, gaze_intensity, budget_ms, image_key)
+            self.future = self._submit()
+        except BaseException:
+            # No future will ever release the segment
+            self._release()
+            raise
+        self.future.add_done_callback(self._on_done)
+
+    def _submit(self):
+        if self._pool is not None:
+            return self._pool.submit(*self._args)
+        return submit(*self._args)
+
+    def _on_done(self, future):
+        broken = not future.cancelled() and isinstance(future.exception(), BrokenProcessPool)
+        if broken and self._pool is None and self._retries > 0 and not self._shm.buf[8]:
+            self._retries -= 1
+            # Called from the dying pool's manager thread: resubmit from another
+            threading.Thread(target=self._retry, daemon=True).start()
+        else:
+            self._release()
+
+    def _retry(self):
+        try:
+            future = self._submit()
+        except Exception as e:
+            print(f"Resubmitting Studio job failed: {e}")
+            self._release()
+            return
+        self.future = future
+        future.add_done_callback(self._on_done)
+
+    @property
+    def progress(self):
+        with self._lock:
+            if self._released:
+                return 1.0
+            return struct.unpack_from("<d", self._shm.buf, 0)[0]
+
+    def done(self):
+        return self._finished.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if not self._released:
+                self._shm.buf[8] = 1
+        self.future.cancel()
+
+    def result(self, timeout=None):
+        from ai.patches import PatchedImage
+        # Wait for the last attempt, not just the current future
+        if not self._finished.wait(timeout):
+            raise TimeoutError()
+        patches, faces, self.timings, degradations = self.future.result()
+        return PatchedImage(self.image, patches, degradations), faces
+
+    def _release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+            self._shm.close()
+            self._shm.unlink()
+        self._finished.set()
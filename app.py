@@ -1,14 +1,18 @@
 import streamlit as st
 import cv2
-import numpy as np
 import tempfile
 import time
+import os
 from supabase import create_client, Client
-from ai.face_mesh import get_face_landmarks
-from ai.smile_warp import warp_smile
-from ai.gaze_correction import correct_gaze
+from ai.studio import decode_image, enhance_image, enhance_cached, get_result_cache, PIPELINE_VERSION
+from ai.job_queue import get_queue
+from ai.patches import PatchedImage
 from ai.gemini_chatbot import parse_image_edit
 from ai.chat_image_pipeline import apply_chat_edits
+from ai.budget import chat_edit_input
+from ai.profiling import profile_run
+from ai.worker_pool import EnhanceJob
+from ai.image_container import Frame, as_bgr
 
 # --- Setup & Config ---
 st.set_page_config(page_title="Picture Perfect", page_icon="📸", layout="wide")
@@ -210,19 +214,166 @@ def login_page():
 
 # --- Core Logic ---
 
-def process_initial(image_bytes, smile_intensity, gaze_intensity):
-    file_bytes = np.asarray(bytearray(image_bytes.read()), dtype=np.uint8)
-    image = cv2.imdecode(file_bytes, 1)
+def process_initial(image_bytes, smile_intensity, gaze_intensity, in_process=False, budget_ms=None):
+    start = time.perf_counter()
+    # Frame caches its RGB/preview views across reruns
+    image = Frame(decode_image(image_bytes.read()))
+    if budget_ms is not None:
+        # Decoding counts against the budget too
+        budget_ms -= (time.perf_counter() - start) * 1000
     
-    faces = get_face_landmarks(image)
+    # Result = original + edited face patches (rendered only for display/download)
+    st.session_state['stage_timings'] = {}
+    result, faces, hit = enhance_cached(
+        image, smile_intensity, gaze_intensity,
+        compute=run_local if in_process else run_in_pool,
+        budget_ms=budget_ms
+    )
+    if hit: st.caption("⚡ Served from cache")
     if not faces: st.warning("No faces detected!")
+    if result.degradations:
+        st.caption("⏱️ To stay within the time budget: " + ", ".join(result.degradations))
     
-    output_image = image.copy()
-    for face in faces:
-        output_image = correct_gaze(output_image, face, intensity=gaze_intensity)
-        output_image = warp_smile(output_image, face, intensity=smile_intensity)
+    return image, result
+
+def run_local(image, smile_intensity, gaze_intensity, budget_ms=None, image_key=None):
+    timings = {}
+    out = enhance_image(image, smile_intensity, gaze_intensity, timings=timings, budget_ms=budget_ms,
+                        image_key=image_key)
+    st.session_state['stage_timings'] = timings
+    return out
+
+def run_in_pool(image, smile_intensity, gaze_intensity, budget_ms=None, image_key=None):
+    # A re-submit makes Streamlit rerun the script; stop the job it abandoned
+    old_job = st.session_state.pop('studio_job', None)
+    if old_job is not None:
+        old_job.cancel()
+
+    job = EnhanceJob(as_bgr(image), smile_intensity, gaze_intensity, budget_ms=budget_ms, image_key=image_key)
+    st.session_state['studio_job'] = job
+    bar = st.progress(0.0)
+    while not job.done():
+        bar.progress(min(1.0, job.progress))
+        time.sleep(0.1)
+    bar.empty()
+    st.session_state.pop('studio_job', None)
+    out = job.result()
+    st.session_state['stage_timings'] = job.timings
+    return out
+
+def set_studio_result(orig, result, name):
+    st.session_state['current_orig'] = orig
+    st.session_state['current_result'] = result
+    # Only a display-size copy of the result stays in the session
+    st.session_state['current_preview'] = Frame(result.render()).preview()
+    for key in ('current_proc', 'current_download', 'chat_view', 'chat_pending', 'chat_download'):
+        st.session_state.pop(key, None)
+    st.session_state['current_name'] = name
+    st.session_state['show_ai_result'] = False
+
+def submit_background(uploaded_file, smile_intensity, gaze_intensity, budget_ms):
+    # Runs in a job_worker.py process; survives reruns and disconnects
+    job_id = get_queue().submit(
+        uploaded_file.getvalue(),
+        {"smile": smile_intensity, "gaze": gaze_intensity, "budget_ms": budget_ms},
+        version=PIPELINE_VERSION
+    )
+    # In the URL too, so a reload / reconnect picks the job back up
+    st.query_params["job"] = job_id
+    st.query_params["name"] = uploaded_file.name
+
+def clear_background():
+    for key in ("job", "name"):
+        if key in st.query_params:
+            del st.query_params[key]
+
+def poll_background():
+    job_id = st.query_params.get("job")
+    if not job_id:
+        return
+    queue = get_queue()
+    job = queue.get(job_id)
+    if job is None:
+        clear_background()
+        return
+
+    if job['status'] in ("queued", "running"):
+        label = "Waiting for a worker..." if job['status'] == "queued" else f"Processing (attempt {job['attempts']})..."
+        st.progress(min(1.0, job['progress']), text=label)
+        time.sleep(1)
+        st.rerun()
     
-    return image, output_image
+    name = st.query_params.get("name", "photo.jpg")
+    clear_background()
+    if job['status'] == "failed":
+        st.error(f"Processing Error: {job['error']}")
+        return
+    try:
+        orig = Frame(decode_image(queue.read_input(job)))
+        result = PatchedImage.from_bytes(queue.read_output(job), orig.bgr())
+    except FileNotFoundError:
+        # Pruned or lost: resubmitting the photo runs the job again
+        st.error("Processing Error: this job's files are no longer available. Please process the photo again.")
+        return
+    set_studio_result(orig, result, name)
+    st.session_state['stage_timings'] = {}
+    if not job['result']['faces']: st.warning("No faces detected!")
+    if result.degradations:
+        st.caption("⏱️ To stay within the time budget: " + ", ".join(result.degradations))
+    st.success("Enhanced!")
+
+def timings_caption(timings):
+    return " · ".join(
+        f"{name} {t['ms']:.0f} ms" + (" (reused)" if t['cached'] else "")
+        for name, t in timings.items()
+    )
+
+def current_proc():
+    # Latest AI Assistant edit if there is one, otherwise the Studio result
+    if 'current_proc' in st.session_state:
+        return st.session_state['current_proc']
+    return st.session_state['current_result'].render()
+
+def apply_chat(commands, budget_ms=None):
+    # Edits always start from the last full-resolution result. When they
+    # don't fit the budget they're shown on a preview and kept pending, so
+    # the full-resolution source is never replaced by a downscaled copy.
+    per_edit = budget_ms / len(commands) if budget_ms is not None else None
+    image, degraded = chat_edit_input(current_proc(), per_edit)
+    for cmd in commands:
+        image = apply_chat_edits(image, cmd)
+    if degraded:
+        st.session_state['chat_pending'] = commands
+    else:
+        st.session_state['current_proc'] = Frame(image)
+        st.session_state['chat_pending'] = []
+    st.session_state['chat_view'] = Frame(image)
+    st.session_state.pop('chat_download', None)
+    st.session_state['chat_degradations'] = degraded
+
+def jpeg_download(key, image):
+    # Encoded once per result and kept in the session, not on every rerun.
+    # image is only called on a miss.
+    if key not in st.session_state:
+        _, buf = cv2.imencode(".jpg", image())
+        st.session_state[key] = buf.tobytes()
+    return st.session_state[key]
+
+def sync_result(user, name, orig_bytes, result):
+    # Original + compact patch file side by side in storage
+    folder = f"{user.id}/{int(time.time())}_{name}"
+    supabase.storage.from_("photos").upload(f"{folder}/original", orig_bytes)
+    supabase.storage.from_("photos").upload(f"{folder}/result.patches", result.to_bytes())
+
+def profile_mode():
+    # ?profile=cprofile|sample in the URL, falls back to PP_PROFILE
+    return st.query_params.get("profile")
+
+def show_profile(session):
+    if session is not None:
+        with st.expander(f"Profile: {session.name}"):
+            st.code(session.summary)
+            st.caption(", ".join(session.files))
 
 # --- App Render ---
 if not st.session_state['user']:
@@ -230,6 +381,15 @@ if not st.session_state['user']:
 else:
     # Authenticated UI - Cleaner, no glass cards
     st.sidebar.markdown(f"**{st.session_state['user'].email}**")
+    cache_stats = get_result_cache().stats()
+    st.sidebar.caption(f"Result cache hit rate: {cache_stats['hit_rate']:.0%}")
+    queue_stats = get_queue().stats()
+    if queue_stats.get('queued') or queue_stats.get('running'):
+        st.sidebar.caption(f"Background jobs: {queue_stats.get('queued', 0)} queued, "
+                           f"{queue_stats.get('running', 0)} running")
+    # 0 = no limit; at peak load a slightly simpler edit beats a timeout
+    budget_ms = st.sidebar.number_input("Time budget (ms)", min_value=0, step=250,
+                                        value=int(os.environ.get("PP_BUDGET_MS", 0))) or None
     if st.sidebar.button("Logout"):
         supabase.auth.sign_out()
         st.session_state['user'] = None
@@ -250,56 +410,90 @@ else:
             
         if uploaded_file:
             uploaded_file.seek(0)
+            # Long jobs go to the persistent queue when job_worker.py is running
+            # (profiling needs the work in this process)
+            background = get_queue().live_workers() > 0 and not profile_mode() and st.checkbox(
+                "Process in background", value=True,
+                help="Keeps going if the page reloads or you close the tab"
+            )
             if st.button("Enhance Photo 🚀", use_container_width=True):
-                with st.spinner("Processing pixels..."):
-                    try:
-                        orig, proc = process_initial(uploaded_file, smile_val, gaze_val)
-                        st.session_state['current_orig'] = orig
-                        st.session_state['current_proc'] = proc
-                        st.session_state['current_name'] = uploaded_file.name
-                        st.session_state['show_ai_result'] = False
-                        st.success("Enhanced!")
-                    except Exception as e:
-                        st.error(f"Processing Error: {e}")
-                        st.warning("AI engine encountered an issue. Please try another photo.")
-        
-        if 'current_proc' in st.session_state:
+                if background:
+                    submit_background(uploaded_file, smile_val, gaze_val, budget_ms)
+                else:
+                    with st.spinner("Processing pixels..."):
+                        try:
+                            with profile_run("process_initial", mode=profile_mode()) as prof:
+                                # Profiling needs the work in this process, not in the pool
+                                orig, result = process_initial(uploaded_file, smile_val, gaze_val,
+                                                               in_process=prof is not None,
+                                                               budget_ms=budget_ms)
+                            st.session_state['last_profile'] = prof
+                            set_studio_result(orig, result, uploaded_file.name)
+                            st.success("Enhanced!")
+                        except Exception as e:
+                            st.error(f"Processing Error: {e}")
+                            st.warning("AI engine encountered an issue. Please try another photo.")
+
+        poll_background()
+
+        show_profile(st.session_state.get('last_profile'))
+        if st.session_state.get('stage_timings'):
+            st.caption(timings_caption(st.session_state['stage_timings']))
+
+        if 'current_result' in st.session_state:
             st.markdown("---")
             ic1, ic2 = st.columns(2)
-            with ic1: st.image(cv2.cvtColor(st.session_state['current_orig'], cv2.COLOR_BGR2RGB), caption="Original")
-            with ic2: st.image(cv2.cvtColor(st.session_state['current_proc'], cv2.COLOR_BGR2RGB), caption="Result")
+            with ic1: st.image(st.session_state['current_orig'].preview(), caption="Original")
+            with ic2: st.image(st.session_state['current_preview'], caption="Result")
             
             # Download Button for Studio
-            _, buf = cv2.imencode(".jpg", st.session_state['current_proc'])
             st.download_button(
                 label="Download Result 📥",
-                data=buf.tobytes(),
+                data=jpeg_download('current_download', st.session_state['current_result'].render),
                 file_name=f"enhanced_{st.session_state['current_name']}",
                 mime="image/jpeg"
             )
+
+            if SUPABASE_AVAILABLE and uploaded_file and uploaded_file.name == st.session_state['current_name'] and st.button("Save to Gallery ☁️"):
+                try:
+                    uploaded_file.seek(0)
+                    sync_result(st.session_state['user'], st.session_state['current_name'],
+                                uploaded_file.read(), st.session_state['current_result'])
+                    st.success("Saved!")
+                except Exception as e:
+                    st.error(f"Sync Error: {e}")
                 
 
 
     # === TAB 2: AI ===
     with t2:
         st.header("AI Assistant")
-        if 'current_proc' in st.session_state:
+        if 'current_result' in st.session_state:
             user_prompt = st.text_input("Edit Instruction", placeholder="Make it brighter...")
             if st.button("Apply"):
                 if user_prompt:
+                    start = time.perf_counter()
                     cmds = parse_image_edit(user_prompt)
-                    st.session_state['current_proc'] = apply_chat_edits(st.session_state['current_proc'], cmds)
+                    chat_budget = budget_ms - (time.perf_counter() - start) * 1000 if budget_ms else None
+                    commands = st.session_state.get('chat_pending', []) + [cmds]
+                    with profile_run("apply_chat_edits", mode=profile_mode()) as prof:
+                        apply_chat(commands, chat_budget)
+                    st.session_state['last_profile'] = prof
                     st.session_state['show_ai_result'] = True
                     st.rerun()
             
             if st.session_state.get('show_ai_result', False):
-                st.image(cv2.cvtColor(st.session_state['current_proc'], cv2.COLOR_BGR2RGB), caption="Result", channels="RGB")
+                st.image(st.session_state['chat_view'].preview(), caption="Result", channels="RGB")
+                if st.session_state.get('chat_degradations'):
+                    st.caption("⏱️ To stay within the time budget: " + ", ".join(st.session_state['chat_degradations']))
+                if st.session_state.get('chat_pending') and st.button("Apply at full resolution"):
+                    apply_chat(st.session_state['chat_pending'])
+                    st.rerun()
                 
                 # Download Button for AI Assistant
-                _, buf = cv2.imencode(".jpg", st.session_state['current_proc'])
                 st.download_button(
                     label="Download AI Result 📥",
-                    data=buf.tobytes(),
+                    data=jpeg_download('chat_download', st.session_state['chat_view'].bgr),
                     file_name=f"ai_edit_{int(time.time())}.jpg",
                     mime="image/jpeg"
                 )
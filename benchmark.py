@@ -0,0 +1,366 @@
+import argparse
+import glob
+import time
+import tracemalloc
+import cv2
+import numpy as np
+
+
+def load_images(paths):
+    images = []
+    for path in paths:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"Skipping unreadable image: {path}")
+            continue
+        images.append(img)
+    if not images:
+        raise SystemExit("No images to benchmark.")
+    return images
+
+
+def bench_landmarks(args):
+    from ai.landmark_backends import benchmark_backends, list_backends, available_backends
+
+    images = load_images(args.images)
+    print(f"Backends: {list_backends()} (available: {available_backends()})")
+
+    # FaceMesh is the usual reference, but newer mediapipe releases don't have it
+    reference = args.reference or next(
+        (n for n in ("face_mesh", "face_landmarker") if n in available_backends()), None)
+    report = benchmark_backends(images, reference=reference, repeats=args.repeats)
+
+    print(f"{'backend':<15}{'ms/image':>10}{'faces':>8}{'nme':>8}  groups")
+    for name, row in sorted(report.items(), key=lambda kv: kv[1]["ms_per_image"]):
+        if "error" in row:
+            print(f"{name:<15}{'failed':>10}{'-':>8}{'-':>8}  {row['error']}")
+            continue
+        nme = f"{row['nme']:.3f}" if row["nme"] is not None else "-"
+        print(f"{name:<15}{row['ms_per_image']:>10.1f}{row['faces']:>8}{nme:>8}  {', '.join(row['groups'])}")
+
+
+def bench_landmarker(args):
+    from ai.face_mesh import get_face_landmarks as face_mesh_landmarks
+    from ai.face_landmarker import FaceLandmarkerService, landmark_images
+
+    # Repeat the input list so the run is long enough to measure
+    paths = list(args.images) * args.repeats
+    n = len(paths)
+
+    start = time.perf_counter()
+    for path in paths:
+        face_mesh_landmarks(cv2.imread(path))
+    legacy = time.perf_counter() - start
+
+    with FaceLandmarkerService(mode="image") as service:
+        service.detect(cv2.imread(paths[0]))  # warm-up
+        start = time.perf_counter()
+        for path in paths:
+            service.detect(cv2.imread(path))
+        image_mode = time.perf_counter() - start
+
+    start = time.perf_counter()
+    landmark_images(paths)
+    live_stream = time.perf_counter() - start
+
+    print(f"{n} images")
+    for label, elapsed in [
+        ("face_mesh (current)", legacy),
+        ("FaceLandmarker IMAGE", image_mode),
+        ("FaceLandmarker LIVE_STREAM", live_stream),
+    ]:
+        print(f"{label:<28}{n / elapsed:>8.2f} img/s{elapsed * 1000 / n:>10.1f} ms/img")
+
+
+def measure(fn, repeats):
+    """Returns (ms per call, peak traced bytes per call)."""
+    fn()  # warm-up (fills caches the way a real run would)
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    elapsed = (time.perf_counter() - start) * 1000 / repeats
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def wall_ms(fn, repeats):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeats
+
+
+def legacy_iris_blend(dest, chip, mask_slice, radius):
+    # The pre-compositing float64 / 3-channel path from warp_eye
+    h, w = chip.shape[:2]
+    mini_mask = np.zeros((h, w), dtype=np.float32)
+    cv2.circle(mini_mask, (w // 2, h // 2), radius - 1, 1.0, -1, lineType=cv2.LINE_AA)
+    mini_mask = cv2.GaussianBlur(mini_mask, (3, 3), 1.0)
+    final = (mask_slice.astype(float) / 255.0) * mini_mask
+    final_3ch = cv2.merge([final, final, final])
+    blended = chip.astype(float) * final_3ch + dest.astype(float) * (1.0 - final_3ch)
+    return blended.astype(np.uint8)
+
+
+def bench_compositing(args):
+    from ai.compositing import blend, feather_circle
+    from ai.landmark_backends import get_backend, studio_backend
+    from ai.gaze_correction import correct_gaze
+    from ai.smile_warp import warp_smile
+
+    rng = np.random.default_rng(0)
+    print(f"{'iris radius':<12}{'legacy ms':>10}{'legacy KB':>11}{'new ms':>9}{'new KB':>9}")
+    for radius in [8, 16, 32, 64]:
+        size = radius * 2
+        dest = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        chip = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+        sclera = np.full((size, size), 255, dtype=np.uint8)
+
+        def new():
+            mask = feather_circle(size, size, radius - 1)
+            return blend(dest, chip, mask * (sclera.astype(np.float32) * np.float32(1.0 / 255.0)))
+
+        old_ms, old_peak = measure(lambda: legacy_iris_blend(dest, chip, sclera, radius), args.repeats)
+        new_ms, new_peak = measure(new, args.repeats)
+        print(f"{radius:<12}{old_ms:>10.3f}{old_peak / 1024:>11.1f}{new_ms:>9.3f}{new_peak / 1024:>9.1f}")
+
+    for image in load_images(args.images):
+        faces = get_backend(studio_backend()).detect(image)
+        if not faces:
+            continue
+
+        def per_image():
+            out = image
+            for face in faces:
+                out = correct_gaze(out, face, intensity=1.0)
+                out = warp_smile(out, face, intensity=6)
+            return out
+
+        ms, peak = measure(per_image, max(1, args.repeats // 100))
+        print(f"{image.shape[1]}x{image.shape[0]}, {len(faces)} faces: "
+              f"{ms / len(faces):.2f} ms/face, peak {peak / 1024 / 1024:.1f} MB")
+
+
+def eye_sharpness(image, landmarks):
+    """Laplacian variance over the box around both eyes: drops when an edit blurs them."""
+    from ai.gaze_correction import LEFT_EYE_CONTOUR, RIGHT_EYE_CONTOUR
+
+    pts = np.array([landmarks[i] for i in LEFT_EYE_CONTOUR + RIGHT_EYE_CONTOUR], dtype=np.float32)
+    x1, y1 = np.maximum(pts.min(axis=0), 0).astype(int)
+    x2, y2 = np.ceil(pts.max(axis=0)).astype(int) + 1
+    gray = cv2.cvtColor(image[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def bench_face_sizes(args):
+    from ai.face_align import EYE_DISTANCE, anchor_points, edit_aligned
+    from ai.gaze_correction import correct_gaze
+    from ai.landmark_backends import get_backend, studio_backend
+    from ai.smile_warp import warp_smile
+
+    image = load_images([args.image])[0]
+    faces = get_backend(args.backend or studio_backend()).detect(image)
+    if not faces:
+        raise SystemExit("No faces found.")
+    face = np.array(faces[0], dtype=np.float32)
+    eyes = anchor_points(face)
+    ipd = float(np.linalg.norm(eyes[1] - eyes[0]))
+
+    # Crop around the face (one face width of margin) and rescale it so the
+    # same face appears at each eye distance
+    x1, y1 = np.maximum(face.min(axis=0) - ipd * 1.5, 0).astype(int)
+    x2, y2 = np.minimum(face.max(axis=0) + ipd * 1.5, image.shape[1::-1]).astype(int)
+    crop = image[y1:y2, x1:x2]
+    face -= (x1, y1)
+
+    def direct(img, lm, scale):
+        return warp_smile(correct_gaze(img, lm, intensity=args.gaze, scale=scale), lm,
+                          intensity=args.smile, scale=scale)
+
+    # Sharpness is of the eye region after the edit (higher = less blurred)
+    print(f"{'eye dist px':<12}{'image':>12}{'direct ms':>11}{'aligned ms':>12}{'changed px':>12}"
+          f"{'direct sharp':>14}{'aligned sharp':>15}")
+    for target in args.eye_distances:
+        s = target / ipd
+        img = cv2.resize(crop, (max(1, int(crop.shape[1] * s)), max(1, int(crop.shape[0] * s))),
+                         interpolation=cv2.INTER_AREA if s < 1 else cv2.INTER_CUBIC)
+        lm = [(int(x * s), int(y * s)) for x, y in face]
+
+        scale = max(target / EYE_DISTANCE, 1.0)
+
+        # Plain wall time: tracemalloc (measure) inflates the Python-heavy direct path
+        direct_ms = wall_ms(lambda: direct(img, lm, scale), args.repeats)
+        # In place like the Studio does (no full-frame copy per face)
+        out = img.copy()
+        aligned_ms = wall_ms(lambda: edit_aligned(out, lm, direct, copy=False), args.repeats)
+        aligned = edit_aligned(img, lm, direct)
+        changed = np.count_nonzero(cv2.absdiff(aligned, img).max(axis=2))
+        direct_sharp = eye_sharpness(direct(img.copy(), lm, scale), lm)
+        print(f"{target:<12g}{f'{img.shape[1]}x{img.shape[0]}':>12}{direct_ms:>11.2f}{aligned_ms:>12.2f}{changed:>12}"
+              f"{direct_sharp:>14.1f}{eye_sharpness(aligned, lm):>15.1f}")
+
+
+CHAT_COMMAND = {"brightness": 10, "contrast": 10, "softness": 0.5, "sharpness": 0.5, "warmth": 10}
+
+
+def calibrate_budget(image, faces):
+    """Prints measured values for the constants in ai/budget.py."""
+    from ai.face_align import align_face
+    from ai.gaze_correction import correct_gaze
+    from ai.patches import PatchedImage
+    from ai.smile_warp import warp_smile
+    from ai.chat_image_pipeline import apply_chat_edits
+
+    chip, lm, _ = align_face(image, faces[0])
+    mp = image.shape[0] * image.shape[1] / 1e6
+    edited = image.copy()
+    edited[:10, :10] = 0
+    print("Measured (ms):")
+    print(f"  FRAME_MS_PER_MP  {wall_ms(lambda: (image.copy(), PatchedImage.from_diff(image, edited).render(), PatchedImage.from_diff(image, edited)), 10) / mp:.1f}")
+    print(f"  ALIGN_MS         {wall_ms(lambda: align_face(image, faces[0]), 50):.2f}")
+    for fill in ["telea", "fast"]:
+        print(f"  GAZE_MS[{fill}]  {wall_ms(lambda: correct_gaze(chip, lm, 1.0, fill=fill), 50):.2f}")
+    for mode in ["seamless", "feather"]:
+        print(f"  SMILE_MS[{mode}] {wall_ms(lambda: warp_smile(chip, lm, 6, blend_mode=mode), 50):.2f}")
+    print(f"  CHAT_MS_PER_MP   {wall_ms(lambda: apply_chat_edits(image, CHAT_COMMAND), 3) / mp:.1f}")
+
+
+def bench_budget(args):
+    from ai.budget import chat_edit_input
+    from ai.chat_image_pipeline import apply_chat_edits
+    from ai.studio import clear_stage_caches, enhance_image
+
+    failures = 0
+    for base in load_images(args.images):
+        for scale in args.scales:
+            image = cv2.resize(base, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+            _, faces = enhance_image(image, 6, 1.0)  # warm-up (models, caches)
+            if args.calibrate and faces:
+                calibrate_budget(image, faces)
+            print(f"\n{image.shape[1]}x{image.shape[0]}, {len(faces)} faces")
+            print(f"{'step':<8}{'budget':>8}{'took':>8}  result")
+
+            for budget_ms in args.budgets:
+                clear_stage_caches()  # a cold run, like a new upload
+                timings = {}
+                start = time.perf_counter()
+                result, _ = enhance_image(image, 6, 1.0, timings=timings, budget_ms=budget_ms)
+                took = (time.perf_counter() - start) * 1000
+                # Landmarks can't be made cheaper; the planner says so when they
+                # alone use the budget up
+                infeasible = any(d.startswith("over budget") for d in result.degradations)
+                status = "ok" if took <= budget_ms else ("infeasible" if infeasible else "OVER")
+                failures += status == "OVER"
+                print(f"{'studio':<8}{budget_ms:>8.0f}{took:>8.0f}  {status}: "
+                      f"{', '.join(result.degradations) or 'full quality'}")
+
+            for budget_ms in args.budgets:
+                start = time.perf_counter()
+                edit_input, degraded = chat_edit_input(image, budget_ms)
+                apply_chat_edits(edit_input, CHAT_COMMAND)
+                took = (time.perf_counter() - start) * 1000
+                status = "ok" if took <= budget_ms else "OVER"
+                failures += status == "OVER"
+                print(f"{'chat':<8}{budget_ms:>8.0f}{took:>8.0f}  {status}: {', '.join(degraded) or 'full resolution'}")
+
+    if failures:
+        raise SystemExit(f"{failures} run(s) went over budget")
+
+
+def _filter_run(megapixels, method, softness, sharpness, queue):
+    # Runs in a fresh process so ru_maxrss is the peak of this case only
+    import resource
+    from ai import image_quality
+
+    side = int(np.sqrt(megapixels * 1e6 / 1.5))
+    img = np.random.default_rng(0).integers(0, 256, (side, int(side * 1.5), 3), dtype=np.uint8)
+    img = cv2.GaussianBlur(img, (0, 0), 2)  # something closer to a photo than noise
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    if method == "legacy":
+        k = int(softness * 30) * 2 + 1
+        out = cv2.GaussianBlur(img, (k, k), 0)
+        blur = cv2.GaussianBlur(out, (0, 0), 3)
+        out = cv2.addWeighted(out, 1 + sharpness, blur, -sharpness, 0)
+    else:
+        out = image_quality.apply_sharpness(image_quality.apply_softness(img, softness), sharpness)
+    elapsed = time.perf_counter() - start
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (peak_rss - base_rss) / 1024.0, out[::7, ::7].copy()))
+
+
+def bench_filters(args):
+    import multiprocessing
+
+    ctx = multiprocessing.get_context("spawn")
+    print(f"softness={args.softness} sharpness={args.sharpness}, tolerance {args.tolerance} (mean abs diff)")
+    print(f"{'MP':>5}{'legacy s':>10}{'legacy MB':>11}{'tiled s':>9}{'tiled MB':>10}{'mean diff':>11}{'max diff':>10}")
+    for mp in args.sizes:
+        rows = {}
+        for method in ["legacy", "tiled"]:
+            queue = ctx.Queue()
+            proc = ctx.Process(target=_filter_run, args=(mp, method, args.softness, args.sharpness, queue))
+            proc.start()
+            rows[method] = queue.get()
+            proc.join()
+
+        diff = np.abs(rows["legacy"][2].astype(np.int16) - rows["tiled"][2].astype(np.int16))
+        status = "ok" if diff.mean() <= args.tolerance else "FAIL"
+        print(f"{mp:>5}{rows['legacy'][0]:>10.2f}{rows['legacy'][1]:>11.0f}"
+              f"{rows['tiled'][0]:>9.2f}{rows['tiled'][1]:>10.0f}{diff.mean():>11.3f}{int(diff.max()):>10}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Picture Perfect benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("landmarks", help="Speed/accuracy of each landmark backend")
+    p.add_argument("images", nargs="*", default=glob.glob("test_images/*.jpg"))
+    p.add_argument("--reference", default=None, help="default: face_mesh, else face_landmarker")
+    p.add_argument("--repeats", type=int, default=3)
+    p.set_defaults(func=bench_landmarks)
+
+    p = sub.add_parser("landmarker", help="Throughput of face_mesh vs Tasks FaceLandmarker")
+    p.add_argument("images", nargs="*", default=glob.glob("test_images/*.jpg"))
+    p.add_argument("--repeats", type=int, default=5)
+    p.set_defaults(func=bench_landmarker)
+
+    p = sub.add_parser("compositing", help="Iris blend and per-face edit cost")
+    p.add_argument("images", nargs="*", default=["test_images/group.jpg"])
+    p.add_argument("--repeats", type=int, default=1000)
+    p.set_defaults(func=bench_compositing)
+
+    p = sub.add_parser("faces", help="Per-face edit cost at several face sizes, direct vs aligned")
+    p.add_argument("image", nargs="?", default="test_images/group.jpg")
+    p.add_argument("--backend", default=None, help="478-point landmark backend (default: the Studio's)")
+    p.add_argument("--eye-distances", type=float, nargs="*", default=[24, 48, 64, 128, 256, 512])
+    p.add_argument("--smile", type=float, default=6.0)
+    p.add_argument("--gaze", type=float, default=1.0)
+    p.add_argument("--repeats", type=int, default=20)
+    p.set_defaults(func=bench_face_sizes)
+
+    p = sub.add_parser("budget", help="Check that latency budgets are met (exit code 1 if not)")
+    p.add_argument("images", nargs="*", default=["test_images/group.jpg"])
+    p.add_argument("--scales", type=float, nargs="*", default=[1, 2, 3])
+    p.add_argument("--budgets", type=float, nargs="*", default=[2000, 1000, 500, 250])
+    p.add_argument("--calibrate", action="store_true", help="Also print measured cost constants")
+    p.set_defaults(func=bench_budget)
+
+    p = sub.add_parser("filters", help="Time/peak memory of softness+sharpness at several sizes")
+    p.add_argument("--sizes", type=float, nargs="*", default=[12, 50, 100], help="megapixels")
+    p.add_argument("--softness", type=float, default=1.0)
+    p.add_argument("--sharpness", type=float, default=0.5)
+    p.add_argument("--tolerance", type=float, default=1.0)
+    p.set_defaults(func=bench_filters)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,95 @@
 import cv2
 import os
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
-def detect_faces_and_eyes(image_path):
+FACE_CASCADE_PATH = "models/haarcascade_frontalface_default.xml"
+EYE_CASCADE_PATH = "models/haarcascade_eye.xml"
+
+# Faces are detected on a copy whose longest side is at most this many pixels
+MAX_DETECT_SIDE = 1024
+# Eye search runs on face crops resized to at most this width
+MAX_EYE_ROI_WIDTH = 256
+NMS_IOU = 0.3
+
+# CascadeClassifier is not safe to share between threads, so each thread
+# loads its own copy once and keeps it
+_local = threading.local()
+_eye_pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="haar-eyes")
+
+
+def _cascade(path):
+    cache = getattr(_local, "cascades", None)
+    if cache is None:
+        cache = _local.cascades = {}
+    if path not in cache:
+        cascade = cv2.CascadeClassifier(path)
+        if cascade.empty():
+            raise ValueError(f"Could not load cascade: {path}")
+        cache[path] = cascade
+    return cache[path]
+
+
+def non_max_suppression(boxes, scores=None, iou_threshold=NMS_IOU):
+    """
+    boxes: (N, 4) array of (x, y, w, h)
+    scores: optional (N,) array, higher is kept first (defaults to box area)
+    Returns the kept boxes as an (M, 4) int array.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    if len(boxes) == 0:
+        return boxes.astype(np.int32)
+
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    areas = boxes[:, 2] * boxes[:, 3]
+    if scores is None:
+        scores = areas
+    order = np.argsort(scores)[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        # IoU of the kept box against all remaining boxes at once
+        ix1 = np.maximum(x1[i], x1[rest])
+        iy1 = np.maximum(y1[i], y1[rest])
+        ix2 = np.minimum(x2[i], x2[rest])
+        iy2 = np.minimum(y2[i], y2[rest])
+        inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter)
+
+        order = rest[iou <= iou_threshold]
+
+    return boxes[keep].astype(np.int32)
+
+
+def _detect_eyes(gray, face):
+    x, y, w, h = face
+    roi_gray = gray[y:y+h, x:x+w]
+    if roi_gray.size == 0:
+        return np.empty((0, 4), dtype=np.int32)
+
+    scale = min(1.0, MAX_EYE_ROI_WIDTH / float(w))
+    if scale < 1.0:
+        roi_gray = cv2.resize(roi_gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    min_eye = max(10, int(20 * scale))
+    eyes = _cascade(EYE_CASCADE_PATH).detectMultiScale(
+        roi_gray,
+        scaleFactor=1.1,
+        minNeighbors=10,
+        minSize=(min_eye, min_eye)
+    )
+    if len(eyes) == 0:
+        return np.empty((0, 4), dtype=np.int32)
+    return np.round(np.asarray(eyes, dtype=np.float32) / scale).astype(np.int32)
+
+
+def detect_faces_and_eyes(image_path, max_side=MAX_DETECT_SIDE):
     image = cv2.imread(image_path)
 
     if image is None:
@@ -9,50 +97,41 @@ def detect_faces_and_eyes(image_path):
 
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    face_cascade = cv2.CascadeClassifier(
-        "models/haarcascade_frontalface_default.xml"
-    )
-    eye_cascade = cv2.CascadeClassifier(
-        "models/haarcascade_eye.xml"
-    )
-
-    faces_strict = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.05,
-        minNeighbors=8,
-        minSize=(60, 60)
-    )
+    # 1. Detect on a bounded-size copy
+    h, w = gray.shape[:2]
+    scale = min(1.0, max_side / float(max(h, w)))
+    small = gray
+    if scale < 1.0:
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
 
-    faces_loose = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.2,
-        minNeighbors=4,
-        minSize=(30, 30)
+    # 2. Single multi-scale pass, between the old strict and loose settings,
+    #    then NMS instead of the pairwise proximity merge
+    min_face = max(24, int(30 * scale))
+    faces, _, weights = _cascade(FACE_CASCADE_PATH).detectMultiScale3(
+        small,
+        scaleFactor=1.1,
+        minNeighbors=5,
+        minSize=(min_face, min_face),
+        outputRejectLevels=True
     )
+    faces = np.asarray(faces, dtype=np.float32).reshape(-1, 4)
+    weights = np.asarray(weights, dtype=np.float32).reshape(-1)
+    faces = non_max_suppression(faces, scores=weights if len(weights) == len(faces) else None)
 
-    faces = list(faces_strict)
+    # 3. Scale boxes back to full resolution
+    faces = np.round(faces / scale).astype(np.int32)
+    faces[:, 2] = np.minimum(faces[:, 2], w - faces[:, 0])
+    faces[:, 3] = np.minimum(faces[:, 3], h - faces[:, 1])
 
-    for face in faces_loose:
-        if not any(
-            abs(face[0] - f[0]) < 20 and abs(face[1] - f[1]) < 20
-            for f in faces
-        ):
-            faces.append(face)
+    # 4. Eyes for every face ROI in parallel (detectMultiScale releases the GIL)
+    face_list = [tuple(int(v) for v in f) for f in faces]
+    eyes_per_face = list(_eye_pool.map(lambda f: _detect_eyes(gray, f), face_list))
 
     results = []
 
-    for (x, y, w, h) in faces:
-        roi_gray = gray[y:y+h, x:x+w]
-
-        eyes = eye_cascade.detectMultiScale(
-            roi_gray,
-            scaleFactor=1.1,
-            minNeighbors=10,
-            minSize=(20, 20)
-        )
-
+    for face, eyes in zip(face_list, eyes_per_face):
         results.append({
-            "face": (x, y, w, h),
+            "face": face,
             "eyes": eyes
         })
 
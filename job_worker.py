@@ -0,0 +1,131 @@
+"""
+Worker for the persistent job queue (ai/job_queue.py).
+
+  python job_worker.py            # run until stopped (Ctrl+C / SIGTERM)
+  python job_worker.py --once     # drain the queue and exit
+
+Run as many as the host has cores to spare; each claims one job at a time.
+A killed worker's job is picked up by another one once its lease runs out.
+"""
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+from ai.job_queue import LeaseLost, get_queue
+
+PRUNE_EVERY = 600.0  # seconds between sweeps of expired jobs (any worker may do it)
+
+
+class Heartbeat:
+    """Renews the job lease in the background and carries the latest progress."""
+
+    def __init__(self, queue, job_id, worker_id):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.progress = 0.0
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        interval = self.queue.lease_seconds / 3
+        while not self._stop.wait(min(interval, 1.0)):
+            self.queue.check_in(self.worker_id)
+            if not self.queue.heartbeat(self.job_id, self.worker_id, self.progress):
+                self.lost = True
+                return
+
+    def update(self, fraction):
+        # Called from the pipeline's progress hook: raising here aborts the job
+        self.progress = fraction
+        if self.lost:
+            raise LeaseLost()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_studio(queue, job, heartbeat):
+    from ai.image_container import Frame
+    from ai.studio import decode_image, enhance_cached, enhance_image
+
+    params = job["params"]
+    image = Frame(decode_image(queue.read_input(job)))
+
+    def compute(image, smile_intensity, gaze_intensity, budget_ms=None, image_key=None):
+        return enhance_image(image, smile_intensity, gaze_intensity,
+                             progress=heartbeat.update, budget_ms=budget_ms, image_key=image_key)
+
+    result, faces, hit = enhance_cached(image, params["smile"], params["gaze"],
+                                        compute=compute, budget_ms=params.get("budget_ms"))
+    return result.to_bytes(), {"faces": len(faces), "degradations": result.degradations, "cache_hit": hit}
+
+
+RUNNERS = {"studio": run_studio}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Picture Perfect job worker")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    parser.add_argument("--poll", type=float, default=1.0, help="seconds between polls when idle")
+    args = parser.parse_args()
+
+    queue = get_queue()
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        # Finish the current job, then exit
+        print("Stopping after the current job...")
+        stopping.set()
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"Worker {worker_id} on {queue.db_path}")
+    last_prune = 0.0
+    try:
+        while not stopping.is_set():
+            queue.check_in(worker_id)
+            if time.monotonic() - last_prune > PRUNE_EVERY:
+                pruned = queue.prune()
+                if pruned:
+                    print(f"Pruned {pruned} finished job(s)")
+                last_prune = time.monotonic()
+            job = queue.claim(worker_id, kinds=list(RUNNERS))
+            if job is None:
+                if args.once:
+                    break
+                stopping.wait(args.poll)
+                continue
+
+            start = time.perf_counter()
+            print(f"Job {job['id']} ({job['kind']}, attempt {job['attempts']}/{job['max_attempts']})")
+            try:
+                with Heartbeat(queue, job["id"], worker_id) as heartbeat:
+                    output, result = RUNNERS[job["kind"]](queue, job, heartbeat)
+                result["ms"] = (time.perf_counter() - start) * 1000
+                if not queue.complete(job["id"], worker_id, output, result):
+                    print(f"Job {job['id']} was taken over by another worker; result dropped")
+                else:
+                    print(f"Job {job['id']} done in {result['ms']:.0f} ms")
+            except LeaseLost:
+                print(f"Job {job['id']}: lease lost, abandoning")
+            except Exception as e:
+                traceback.print_exc()
+                queue.fail(job["id"], worker_id, f"{type(e).__name__}: {e}")
+    finally:
+        queue.check_out(worker_id)
+
+
+if __name__ == "__main__":
+    main()
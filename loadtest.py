@@ -0,0 +1,356 @@
+"""
+Load test for the Studio + AI Assistant paths.
+
+Virtual users arrive as a Poisson process and each runs one session the way
+app.py would: upload a photo (decode + enhance), move the sliders a few times,
+then send chat edits (stubbed Gemini + apply_chat_edits). Reports latency
+percentiles per operation, throughput, CPU and peak RSS (including pool
+workers), and can sweep arrival rates to find where a worker configuration
+saturates.
+
+  python loadtest.py --rate 0.5 --duration 60
+  python loadtest.py --mode pool --workers 4 --sweep 0.25 0.5 1 2
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+CHAT_PROMPTS = ["make it brighter", "more contrast please", "soften the skin a bit",
+                "sharper", "warmer tones", "cooler and a little darker"]
+CHAT_REPLIES = ['{"brightness": 20}', '{"contrast": 25}', '{"softness": 0.4}',
+                '{"sharpness": 0.5}', '{"warmth": 20}', '{"warmth": -15, "brightness": -10}']
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_TICK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+class StubModel:
+    """Stands in for the Gemini model: fixed latency with jitter, canned replies."""
+
+    def __init__(self, latency_ms, seed=0):
+        self.latency = latency_ms / 1000.0
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self.lock:
+            delay = self.rng.uniform(0.5, 1.5) * self.latency
+            reply = self.rng.choice(CHAT_REPLIES)
+        time.sleep(delay)
+        return type("Response", (), {"text": reply})()
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+        self.sessions = 0
+
+    def record(self, op, ms):
+        with self.lock:
+            self.samples.setdefault(op, []).append(ms)
+
+    def error(self, op, e):
+        with self.lock:
+            self.errors[op] = self.errors.get(op, 0) + 1
+            if self.errors[op] == 1:
+                print(f"{op} failed: {type(e).__name__}: {e}")
+
+    def timed(self, op, fn, *args):
+        start = time.perf_counter()
+        try:
+            out = fn(*args)
+        except Exception as e:
+            self.error(op, e)
+            raise
+        self.record(op, (time.perf_counter() - start) * 1000)
+        return out
+
+
+# --- Resource usage (this process + live pool workers) ---
+
+def _proc_stat(pid):
+    """(cpu seconds, rss bytes) from /proc, or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open(f"/proc/{pid}/statm") as f:
+            rss_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    # utime and stime are fields 14 and 15 (11 and 12 after the command name)
+    return (int(fields[11]) + int(fields[12])) / _TICK, rss_pages * _PAGE
+
+
+class ResourceMonitor:
+    """Samples RSS every `interval` seconds and tracks CPU time of children that are still alive."""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.peak_rss = 0
+        self.child_cpu = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _sample(self):
+        total = 0
+        own = _proc_stat(os.getpid())
+        if own is None:
+            # No /proc: fall back to getrusage (KB on Linux, bytes on macOS)
+            scale = 1 if os.uname().sysname == "Darwin" else 1024
+            total = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        else:
+            total = own[1]
+        for child in multiprocessing.active_children():
+            stat = _proc_stat(child.pid)
+            if stat:
+                self.child_cpu[child.pid] = stat[0]
+                total += stat[1]
+        self.peak_rss = max(self.peak_rss, total)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def cpu_seconds(self):
+        t = os.times()
+        # Live children are not in os.times() until they are reaped
+        return t.user + t.system + t.children_user + t.children_system + sum(self.child_cpu.values())
+
+    def __enter__(self):
+        self._sample()
+        self.cpu_start = self.cpu_seconds()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        self.cpu_used = self.cpu_seconds() - self.cpu_start
+
+
+# --- Virtual user ---
+
+def make_uploads(paths, sizes):
+    """One JPEG per (photo, megapixel size), like a mix of phone and camera uploads."""
+    uploads = []
+    for path in paths:
+        img = cv2.imread(path)
+        if img is None:
+            print(f"Skipping unreadable image: {path}")
+            continue
+        h, w = img.shape[:2]
+        for mp in sizes:
+            scale = (mp * 1e6 / (h * w)) ** 0.5
+            resized = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+            _, buf = cv2.imencode(".jpg", resized, [cv2.IMWRITE_JPEG_QUALITY, 92])
+            uploads.append((f"{os.path.basename(path)}@{mp:g}MP", buf.tobytes()))
+    if not uploads:
+        raise SystemExit("No images to upload.")
+    return uploads
+
+
+def slider_value(rng):
+    # Streamlit sliders move in 0.05 steps
+    return round(rng.randint(0, 20) * 0.05, 2)
+
+
+def virtual_user(uid, args, uploads, rec, compute):
+    from ai.studio import decode_image, enhance_cached
+    from ai.chat_image_pipeline import apply_chat_edits
+    from ai.budget import chat_edit_input
+    from ai.gemini_chatbot import parse_image_edit
+    from ai.image_container import Frame
+
+    rng = random.Random(args.seed * 100003 + uid)
+    think = lambda: time.sleep(rng.expovariate(1.0 / args.think_time) if args.think_time > 0 else 0)
+
+    def upload(data, smile, gaze):
+        image = decode_image(data)
+        if not args.repeat_uploads:
+            # Distinct pixels per user so the shared result cache doesn't
+            # turn every upload of the same test photo into a hit
+            image[0, 0] = (uid % 256, (uid // 256) % 256, 255)
+        frame = Frame(image)
+        return frame, enhance_cached(frame, smile, gaze, compute=compute, budget_ms=args.budget_ms)
+
+    try:
+        _, data = rng.choice(uploads)
+        smile, gaze = slider_value(rng), slider_value(rng)
+        frame, (result, _, _) = rec.timed("upload", upload, data, smile, gaze)
+
+        for _ in range(args.slider_moves):
+            think()
+            if rng.random() < 0.5:
+                smile = slider_value(rng)
+            else:
+                gaze = slider_value(rng)
+            result, _, _ = rec.timed("slider", enhance_cached, frame, smile, gaze, compute, args.budget_ms)
+
+        proc = result.render()
+        for _ in range(args.chat_edits):
+            think()
+            start = time.perf_counter()
+            cmds = rec.timed("chat_parse", parse_image_edit, rng.choice(CHAT_PROMPTS))
+            edit_input, _ = chat_edit_input(proc, args.budget_ms)
+            proc = rec.timed("chat_apply", apply_chat_edits, edit_input, cmds)
+            rec.record("chat", (time.perf_counter() - start) * 1000)
+    except Exception:
+        pass  # counted by the recorder
+    finally:
+        with rec.lock:
+            rec.sessions += 1
+
+
+def make_compute(mode):
+    from ai.studio import enhance_image
+    if mode == "local":
+        return enhance_image
+
+    from ai.worker_pool import EnhanceJob
+    from ai.image_container import as_bgr
+
+    def run_in_pool(image, smile_intensity, gaze_intensity, budget_ms=None, image_key=None):
+        return EnhanceJob(as_bgr(image), smile_intensity, gaze_intensity, budget_ms=budget_ms,
+                          image_key=image_key).result()
+    return run_in_pool
+
+
+def run_load(rate, args, uploads, compute):
+    """Open-loop arrivals at `rate` sessions/s for args.duration seconds, then drain."""
+    rec = Recorder()
+    rng = random.Random(args.seed + int(rate * 1000))
+    arrivals = 0
+
+    with ResourceMonitor() as mon:
+        start = time.perf_counter()
+        # max_sessions plays the role of the server's thread budget; sessions
+        # arriving above it wait, and that wait shows up as "queued"
+        with ThreadPoolExecutor(max_workers=args.max_sessions) as executor:
+            next_at = rng.expovariate(rate)
+            while next_at < args.duration:
+                time.sleep(max(0.0, start + next_at - time.perf_counter()))
+                submitted = time.perf_counter()
+
+                def session(uid=arrivals, submitted=submitted):
+                    rec.record("queued", (time.perf_counter() - submitted) * 1000)
+                    virtual_user(uid, args, uploads, rec, compute)
+
+                executor.submit(session)
+                arrivals += 1
+                next_at += rng.expovariate(rate)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "rate": rate,
+        "arrivals": arrivals,
+        "elapsed": elapsed,
+        "samples": rec.samples,
+        "errors": rec.errors,
+        "sessions_per_s": rec.sessions / elapsed,
+        "ops_per_s": sum(len(v) for k, v in rec.samples.items() if k in ("upload", "slider", "chat")) / elapsed,
+        "cpu_cores": mon.cpu_used / elapsed,
+        "peak_rss_mb": mon.peak_rss / 1e6,
+    }
+
+
+def percentiles(values):
+    return np.percentile(values, [50, 95, 99]) if values else [float("nan")] * 3
+
+
+def print_report(stats):
+    print(f"\nrate {stats['rate']:g}/s: {stats['arrivals']} sessions in {stats['elapsed']:.1f}s"
+          f" -> {stats['sessions_per_s']:.2f} sessions/s, {stats['ops_per_s']:.2f} ops/s,"
+          f" CPU {stats['cpu_cores']:.2f} cores, peak RSS {stats['peak_rss_mb']:.0f} MB")
+    print(f"{'operation':<12}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for op in ["queued", "upload", "slider", "chat", "chat_parse", "chat_apply"]:
+        values = stats["samples"].get(op, [])
+        p50, p95, p99 = percentiles(values)
+        print(f"{op:<12}{len(values):>6}{p50:>10.0f}{p95:>10.0f}{p99:>10.0f}{stats['errors'].get(op, 0):>8}")
+
+
+def saturated(stats, args):
+    """Behind if sessions wait for a server slot or upload p95 breaks the SLO."""
+    queued_p95 = percentiles(stats["samples"].get("queued", []))[1]
+    upload_p95 = percentiles(stats["samples"].get("upload", []))[1]
+    return queued_p95 > 1000 or upload_p95 > args.slo_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Picture Perfect load test")
+    parser.add_argument("images", nargs="*", default=glob.glob("test_images/group.jpg"))
+    parser.add_argument("--sizes", type=float, nargs="*", default=[2, 6, 12], help="upload sizes in megapixels")
+    parser.add_argument("--mode", choices=["local", "pool"], default="local",
+                        help="run the Studio in-process or through the worker pool")
+    parser.add_argument("--workers", type=int, help="pool size (sets PP_WORKERS)")
+    parser.add_argument("--rate", type=float, default=0.5, help="session arrivals per second")
+    parser.add_argument("--sweep", type=float, nargs="*", help="arrival rates to try in turn")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of arrivals per run")
+    parser.add_argument("--max-sessions", type=int, default=32, help="concurrent sessions served")
+    parser.add_argument("--slider-moves", type=int, default=3)
+    parser.add_argument("--chat-edits", type=int, default=2)
+    parser.add_argument("--think-time", type=float, default=2.0, help="mean seconds between a user's actions")
+    parser.add_argument("--chat-latency-ms", type=float, default=800.0, help="stubbed Gemini latency")
+    parser.add_argument("--budget-ms", type=float, help="latency budget passed to the Studio and chat edits")
+    parser.add_argument("--slo-ms", type=float, default=10000.0, help="upload p95 target for the sweep")
+    parser.add_argument("--repeat-uploads", action="store_true",
+                        help="let users upload identical pixels (exercises the result cache)")
+    parser.add_argument("--cache-dir", help="result cache location (default: a fresh temp dir)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Must be set before ai.studio / ai.worker_pool are imported (and inherited by workers)
+    os.environ["PP_CACHE_DIR"] = args.cache_dir or tempfile.mkdtemp(prefix="pp-loadtest-")
+    os.environ["PP_STAGE_CACHE_DIR"] = os.environ["PP_CACHE_DIR"].rstrip("/") + "-stages"
+    if args.workers:
+        os.environ["PP_WORKERS"] = str(args.workers)
+
+    from ai.gemini_chatbot import GeminiClient, set_client
+    set_client(GeminiClient(model=StubModel(args.chat_latency_ms, args.seed)))
+
+    uploads = make_uploads(args.images, args.sizes)
+    compute = make_compute(args.mode)
+    print(f"{len(uploads)} upload variants, mode={args.mode}, cache={os.environ['PP_CACHE_DIR']}")
+
+    # Warm up (model load, pool spawn) outside the measured runs
+    from ai.studio import decode_image
+    warm = decode_image(uploads[0][1])
+    warm[0, 0] = (0, 0, 0)
+    compute(warm, 0.0, 0.0)
+
+    rates = args.sweep or [args.rate]
+    results = []
+    for rate in rates:
+        stats = run_load(rate, args, uploads, compute)
+        print_report(stats)
+        results.append(stats)
+
+    if len(results) > 1:
+        print(f"\n{'rate/s':>8}{'sessions/s':>12}{'upload p95':>12}{'cpu':>7}{'rss MB':>8}")
+        kept_up = None
+        for stats in results:
+            p95 = percentiles(stats["samples"].get("upload", []))[1]
+            flag = "  saturated" if saturated(stats, args) else ""
+            print(f"{stats['rate']:>8g}{stats['sessions_per_s']:>12.2f}{p95:>12.0f}"
+                  f"{stats['cpu_cores']:>7.2f}{stats['peak_rss_mb']:>8.0f}{flag}")
+            if not flag:
+                kept_up = max(kept_up or 0, stats["rate"])
+        if kept_up is None:
+            print("Saturated at every rate tried.")
+        else:
+            print(f"Highest rate that kept up: {kept_up:g} sessions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,54 @@
+import argparse
 import cv2
-from ai.face_mesh import get_face_landmarks
-from ai.smile_warp import warp_smile
-from ai.gaze_correction import correct_gaze
+from ai.studio import enhance_image
 from ai.gemini_chatbot import parse_image_edit
 from ai.chat_image_pipeline import apply_chat_edits
+from ai.profiling import profile_run
+from ai.budget import chat_edit_input
+from ai.burst import best_shot
 
-image = cv2.imread("test_images/group.jpg")
-faces = get_face_landmarks(image)
+parser = argparse.ArgumentParser()
+parser.add_argument("--profile", nargs="?", const="cprofile", default=None,
+                    help="Profile this run (cprofile or sample); also PP_PROFILE")
+parser.add_argument("--budget-ms", type=float, default=None,
+                    help="Latency budget per step; cheaper edit variants are used to fit")
+parser.add_argument("--burst", nargs="+", metavar="FRAME", default=None,
+                    help="Burst frames of one group shot: composite everyone's best face")
+args = parser.parse_args()
 
-for face in faces:
-    # 0. Debug Gaze (Draw points)
-    # from ai.gaze_correction import draw_debug_gaze
-    # draw_debug_gaze(image, face, True)
-    # draw_debug_gaze(image, face, False)
+if args.burst:
+    frames = [cv2.imread(path) for path in args.burst]
+    if any(frame is None for frame in frames):
+        parser.error("could not read every --burst frame")
+    with profile_run("best_shot", mode=args.profile) as prof:
+        # 0. Best face per person across the burst, then gaze/smile only where still needed
+        result, people, ref = best_shot(frames, smile_intensity=6, gaze_intensity=1.0)
+        image = result.render()
+    print(f"Reference frame: {args.burst[ref]}")
+    for i, person in enumerate(people):
+        print(f"  face {i}: from {args.burst[person['frame']]} (score {person['score']:.2f}),"
+              f" edits: {', '.join(person['edits']) or 'none'}")
+else:
+    image = cv2.imread("test_images/group.jpg")
 
-    # 1. Correct Gaze (Eyes looking at camera)
-    # Intensity=1.0 moves the iris to the center of the eye.
-    image = correct_gaze(image, face, intensity=1.0)
-    
-    # 2. Warp Smile
-    image = warp_smile(image, face, intensity=6)
+    with profile_run("process_initial", mode=args.profile) as prof:
+        # 1. Correct Gaze (Eyes looking at camera) and 2. Warp Smile, per face
+        # Intensity=1.0 moves the iris to the center of the eye.
+        result, faces = enhance_image(image, smile_intensity=6, gaze_intensity=1.0, budget_ms=args.budget_ms)
+        image = result.render()
+if prof: print(prof.summary)
+if result.degradations: print("Budget degradations:", ", ".join(result.degradations))
 
 # 3. AI Chat Edits (Gemini)
 user_text = "Make the photo softer, slightly brighter, and warm"
 try:
     command = parse_image_edit(user_text)
     print(f"Applying AI Edits ({user_text}):", command)
-    image = apply_chat_edits(image, command)
+    edit_input, degraded = chat_edit_input(image, args.budget_ms)
+    if degraded: print("Budget degradations:", ", ".join(degraded))
+    with profile_run("apply_chat_edits", mode=args.profile) as prof:
+        image = apply_chat_edits(edit_input, command)
+    if prof: print(prof.summary)
 except Exception as e:
     print(f"AI Edit failed: {e}")
 
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from ai.budget import FULL_QUALITY, MARGIN, MIN_CHAT_SIDE, chat_edit_input, estimate_ms, plan
+
+SHAPE = (3000, 4000, 3)
+
+
+def face(x, y, size):
+    """478 landmarks with the eyes `size` px apart; only the anchors matter."""
+    pts = np.zeros((478, 2), dtype=np.float32)
+    pts[[33, 133]] = (x, y)
+    pts[[362, 263]] = (x + size, y)
+    pts[[61, 291]] = (x + size / 2, y + size)
+    return [tuple(p) for p in pts.tolist()]
+
+
+# tiny, big, medium
+FACES = [face(100, 100, 10), face(500, 500, 300), face(2000, 500, 60)]
+SIZES = [10.0, 300.0, 60.0]
+
+
+def budget_for(**params):
+    """Smallest budget at which these params fit."""
+    return estimate_ms(SHAPE, SIZES, {**FULL_QUALITY, **params}) / MARGIN + 1e-6
+
+
+def test_full_quality_when_it_fits():
+    p = plan(SHAPE, FACES, budget_for())
+    assert p.params == FULL_QUALITY
+    assert p.degradations == []
+
+
+def test_degradations_in_order():
+    steps = [
+        ({"skip_faces": (0,)}, ["skipped 1 tiny face(s)"]),
+        ({"skip_faces": (0,), "iris_fill": "fast"}, ["skipped 1 tiny face(s)", "fast iris fill"]),
+        ({"skip_faces": (0,), "iris_fill": "fast", "smile_blend": "feather"},
+         ["skipped 1 tiny face(s)", "fast iris fill", "feathered smile blend"]),
+        ({"skip_faces": (0, 2), "iris_fill": "fast", "smile_blend": "feather"},
+         ["skipped 1 tiny face(s)", "fast iris fill", "feathered smile blend",
+          "skipped 1 more face(s), smallest first"]),
+    ]
+    for params, expected in steps:
+        p = plan(SHAPE, FACES, budget_for(**params))
+        assert p.params == {**FULL_QUALITY, **params}
+        assert p.degradations == expected
+        assert p.estimate_ms <= p.budget_ms * MARGIN
+
+
+def test_skipping_every_face_collapses_the_list():
+    p = plan(SHAPE, FACES, 0.01)
+    assert p.params["skip_faces"] == (0, 1, 2)
+    assert p.degradations == ["skipped all 3 face(s)"]
+    assert p.estimate_ms == 0
+
+
+def test_no_budget_left():
+    p = plan(SHAPE, FACES, 0)
+    assert p.degradations == ["skipped all 3 face(s)", "over budget: landmarks alone used it up"]
+    p = plan(SHAPE, FACES, -50)
+    assert p.degradations[-1] == "over budget: landmarks alone used it up"
+
+
+def test_no_faces():
+    p = plan(SHAPE, [], 1.0)
+    assert p.degradations == []
+    assert p.estimate_ms == 0
+
+
+def test_chat_edit_input():
+    image = np.zeros(SHAPE, dtype=np.uint8)
+
+    full, degraded = chat_edit_input(image, None)
+    assert full.shape == SHAPE and degraded == []
+
+    preview, degraded = chat_edit_input(image, 1.0)
+    assert max(preview.shape[:2]) == MIN_CHAT_SIDE
+    assert preview.shape[1] / preview.shape[0] == pytest.approx(4 / 3, rel=0.01)
+    assert degraded == [f"chat edits at {preview.shape[1]}x{preview.shape[0]} preview"]
+
+    # A looser budget gives a bigger preview, never below MIN_CHAT_SIDE
+    bigger, _ = chat_edit_input(image, 400.0)
+    assert MIN_CHAT_SIDE < max(bigger.shape[:2]) < max(SHAPE)
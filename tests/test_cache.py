@@ -0,0 +1,37 @@
+import os
+
+from ai.cache import MARKER, DiskCache
+
+
+def older(name):
+    return name.startswith("v") and name[1:].isdigit() and int(name[1:]) < 2
+
+
+def test_prunes_only_stale_namespaces_in_its_own_directory(tmp_path):
+    root = tmp_path / "cache"
+    DiskCache(str(root), namespace="v1").put("k", b"old")
+    (root / "notes").mkdir()
+    (root / "v3").mkdir()
+
+    DiskCache(str(root), namespace="v2", stale=older)
+    assert sorted(os.listdir(root)) == sorted([MARKER, "notes", "v2", "v3"])
+
+
+def test_never_prunes_a_directory_it_did_not_create(tmp_path):
+    (tmp_path / "v1").mkdir()
+    (tmp_path / "unrelated.txt").write_text("keep me")
+
+    cache = DiskCache(str(tmp_path), namespace="v2", stale=older)
+    assert (tmp_path / "v1").is_dir()
+    assert not (tmp_path / MARKER).exists()
+
+    cache.put("k", b"data")
+    assert cache.get("k") == b"data"
+
+
+def test_overwriting_a_key_does_not_grow_the_size(tmp_path):
+    cache = DiskCache(str(tmp_path), namespace="v1", max_bytes=100)
+    for _ in range(5):
+        cache.put("k", b"x" * 60)
+    assert cache._size == 60
+    assert cache.get("k") == b"x" * 60
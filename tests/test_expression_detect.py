@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from ai.expression_detect import (
+    detect_expressions, detect_expressions_async, detect_expressions_grouped,
+    set_classifier, top_label,
+)
+
+LABELS = ["angry", "happy", "neutral"]
+
+
+class StubClassifier:
+    """
+    Scores each image by its mean pixel value so results are tied to the
+    input; records every call.
+    """
+
+    class model:
+        class config:
+            id2label = dict(enumerate(LABELS))
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, images, batch_size=None, top_k=None):
+        self.calls.append({"images": images, "batch_size": batch_size, "top_k": top_k})
+        outputs = []
+        for img in images:
+            value = float(np.asarray(img).mean()) / 255.0
+            outputs.append([
+                {"label": "happy", "score": value},
+                {"label": "neutral", "score": 1.0 - value},
+                {"label": "angry", "score": 0.0},
+            ][:top_k])
+        return outputs
+
+
+@pytest.fixture
+def classifier():
+    stub = StubClassifier()
+    set_classifier(stub)
+    yield stub
+    set_classifier(None)
+
+
+def crop(value):
+    return np.full((8, 8, 3), value, dtype=np.uint8)
+
+
+def test_batch_size_is_forwarded_and_all_labels_asked_for(classifier):
+    detect_expressions([crop(10), crop(20)], batch_size=5)
+    assert len(classifier.calls) == 1
+    assert classifier.calls[0]["batch_size"] == 5
+    assert classifier.calls[0]["top_k"] == len(LABELS)
+
+
+def test_full_distributions_in_input_order(classifier):
+    values = [200, 0, 51]
+    dists = detect_expressions([crop(v) for v in values])
+
+    assert [set(d) for d in dists] == [set(LABELS)] * 3
+    for v, dist in zip(values, dists):
+        assert dist["happy"] == pytest.approx(v / 255.0)
+    assert [top_label(d) for d in dists] == ["happy", "neutral", "neutral"]
+
+
+def test_grouped_results_split_per_image(classifier):
+    groups = [[crop(255), crop(0)], [], [crop(255)]]
+    grouped = detect_expressions_grouped(groups)
+
+    assert len(classifier.calls) == 1  # all images scored together
+    assert [len(g) for g in grouped] == [2, 0, 1]
+    assert [top_label(d) for d in grouped[0]] == ["happy", "neutral"]
+    assert top_label(grouped[2][0]) == "happy"
+
+
+def test_memoized_crops_are_not_classified_again(classifier):
+    detect_expressions([crop(10), crop(20)])
+    dists = detect_expressions([crop(20), crop(30), crop(10)])
+
+    assert len(classifier.calls) == 2
+    assert len(classifier.calls[1]["images"]) == 1  # only the new crop
+    assert dists[1]["happy"] == pytest.approx(30 / 255.0)
+
+    # Cached results are copies: callers can't corrupt the cache
+    dists[0]["happy"] = -1
+    assert detect_expressions([crop(20)])[0]["happy"] == pytest.approx(20 / 255.0)
+
+
+def test_async_matches_sync(classifier):
+    future = detect_expressions_async([crop(100)])
+    assert future.result(timeout=5) == detect_expressions([crop(100)])
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from ai import expression_edit
+from ai.expression_edit import edit_expressions, set_pipeline
+from ai.process_image import process_image
+
+
+class StubPipeline:
+    """Returns each input image inverted; records every call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, prompt, image, **kwargs):
+        self.calls.append({"prompt": prompt, "image": image, **kwargs})
+
+        class Output:
+            images = [Image.fromarray(255 - np.array(img)) for img in image]
+        return Output()
+
+
+@pytest.fixture
+def pipe():
+    stub = StubPipeline()
+    set_pipeline(stub)
+    yield stub
+    set_pipeline(None)
+
+
+def crop(h, w, value):
+    img = np.full((h, w, 3), value, dtype=np.uint8)
+    img[0, 0] = (h, w, value)  # distinct content per crop
+    return img
+
+
+def test_uncached_crops_go_through_one_call_at_edit_size(pipe):
+    crops = [crop(40, 30, 10), crop(64, 64, 20), crop(25, 50, 30)]
+    edit_expressions(crops, "happy", size=64)
+
+    assert len(pipe.calls) == 1
+    call = pipe.calls[0]
+    assert len(call["image"]) == 3
+    assert len(call["prompt"]) == 3
+    assert all(img.size == (64, 64) for img in call["image"])
+
+
+def test_outputs_keep_each_crops_shape(pipe):
+    crops = [crop(40, 30, 10), crop(25, 50, 30)]
+    results = edit_expressions(crops, "happy", size=64)
+
+    assert [r.shape for r in results] == [c.shape for c in crops]
+    # The stub inverts, so the flat area comes back as 255 - value
+    assert results[0][20, 15, 0] == 245
+
+
+def test_repeat_call_is_served_from_cache(pipe):
+    crops = [crop(40, 30, 10), crop(25, 50, 30)]
+    first = edit_expressions(crops, "happy", seed=3, size=64)
+    assert len(expression_edit._edit_cache) == 2
+
+    second = edit_expressions(crops, "happy", seed=3, size=64)
+    assert len(pipe.calls) == 1
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+
+    # Another seed or expression is a different edit
+    edit_expressions(crops, "happy", seed=4, size=64)
+    edit_expressions(crops, "sad", seed=3, size=64)
+    assert len(pipe.calls) == 3
+
+
+def test_process_image_skips_empty_crops(pipe):
+    image = np.zeros((100, 100, 3), dtype=np.uint8)
+    faces = [(20, 20, 30, 30), (500, 500, 10, 10)]  # second box is off the image
+    out = process_image(image, faces, "happy", size=64)
+
+    assert len(pipe.calls) == 1
+    assert len(pipe.calls[0]["image"]) == 1
+    # Only the first face's padded box was pasted back
+    assert out[35, 35].max() > 0
+    assert out[99, 99].max() == 0
+
+
+def test_process_image_without_faces_does_not_call_pipeline(pipe):
+    image = np.zeros((50, 50, 3), dtype=np.uint8)
+    assert process_image(image, [(500, 500, 10, 10)], "happy") is image
+    assert pipe.calls == []
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from ai.face_align import CANONICAL_SIZE, MAX_CHIP_SCALE, edit_aligned
+
+
+def degenerate_face():
+    return [(50, 50)] * 478  # every anchor on one point: no usable transform
+
+
+def test_unusable_landmarks_still_return_a_copy():
+    image = np.zeros((100, 100, 3), dtype=np.uint8)
+    out = edit_aligned(image, degenerate_face(), lambda chip, lm, scale: chip)
+    assert out is not image
+    out[:] = 255
+    assert image.max() == 0
+
+
+def test_unusable_landmarks_in_place():
+    image = np.zeros((100, 100, 3), dtype=np.uint8)
+    assert edit_aligned(image, degenerate_face(), lambda chip, lm, scale: chip, copy=False) is image
+
+
+def face(size):
+    """478 landmarks with the eyes `size` px apart; only the anchors matter."""
+    pts = np.zeros((478, 2), dtype=np.float32)
+    pts[[33, 133]] = (10, 10)
+    pts[[362, 263]] = (10 + size, 10)
+    pts[[61, 291]] = (10 + size / 2, 10 + size)
+    return [tuple(p) for p in pts.tolist()]
+
+
+@pytest.mark.parametrize("eye_distance, scale", [(20, 1.0), (128, 2.0), (1000, MAX_CHIP_SCALE)])
+def test_big_faces_get_bigger_chips(eye_distance, scale):
+    image = np.zeros((1200, 1200, 3), dtype=np.uint8)
+    seen = {}
+
+    def edit(chip, lm, s):
+        seen["shape"], seen["scale"] = chip.shape[:2], s
+        return chip
+
+    edit_aligned(image, face(eye_distance), edit)
+    assert seen["scale"] == pytest.approx(scale)
+    assert seen["shape"] == (round(CANONICAL_SIZE * scale),) * 2
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import time
+
+from ai.gemini_chatbot import CircuitBreaker, GeminiClient, parse_image_edit, set_client, validate_edit
+
+
+class StubModel:
+    """Async stand-in for the Gemini model: fixed reply after `delay` seconds."""
+
+    def __init__(self, reply=None, delay=0.0, fail=False):
+        self.reply = json.dumps(reply if reply is not None else {"brightness": 10})
+        self.delay = delay
+        self.fail = fail
+        self.prompts = []
+
+    async def generate_content_async(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("quota exceeded")
+
+        class Response:
+            text = self.reply
+        return Response()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_validate_edit_clamps_and_coerces():
+    reply = '```json\n{"brightness": 250, "contrast": "-20.6", "softness": 2, "warmth": true, "sharpness": "x", "gaze": 1}\n```'
+    assert validate_edit(reply) == {"brightness": 100, "contrast": -21, "softness": 1.0}
+    assert validate_edit('{"sharpness": NaN}') == {}
+    assert validate_edit("not json") == {}
+    assert validate_edit("[1, 2]") == {}
+    assert validate_edit(None) == {}
+
+
+def test_identical_prompts_in_flight_share_one_request():
+    model = StubModel(delay=0.05)
+    client = GeminiClient(model=model)
+
+    async def run():
+        return await asyncio.gather(*[client.parse("brighter") for _ in range(5)], client.parse("warmer"))
+    results = asyncio.run(run())
+
+    assert len(model.prompts) == 2
+    assert client.stats["coalesced"] == 4
+    assert results[0] == {"brightness": 10}
+    results[0]["brightness"] = 99  # each caller gets its own dict
+    assert results[1] == {"brightness": 10}
+
+
+def test_timeout_returns_empty():
+    client = GeminiClient(model=StubModel(delay=1.0), timeout=0.05)
+    start = time.perf_counter()
+    assert asyncio.run(client.parse("brighter")) == {}
+    assert time.perf_counter() - start < 0.5
+    assert client.stats["failures"] == 1
+
+
+def test_deadline_includes_waiting_for_a_slot():
+    client = GeminiClient(model=StubModel(delay=0.3), timeout=0.4, max_concurrent=1)
+
+    async def run():
+        start = time.perf_counter()
+        results = await asyncio.gather(*[client.parse(f"edit {i}") for i in range(3)])
+        return results, time.perf_counter() - start
+    results, took = asyncio.run(run())
+
+    assert results[0] == {"brightness": 10}
+    assert results[1:] == [{}, {}]  # queued behind the first past their deadline
+    assert took < 0.6
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=2, cooldown=10, clock=clock)
+    model = StubModel(fail=True)
+    client = GeminiClient(model=model, breaker=breaker)
+
+    for _ in range(2):
+        assert asyncio.run(client.parse("brighter")) == {}
+    assert breaker.state == "open"
+
+    # Open: fails fast without calling the model
+    assert asyncio.run(client.parse("brighter")) == {}
+    assert len(model.prompts) == 2
+    assert client.stats["short_circuited"] == 1
+
+    # Half-open: one trial; a failure opens it again
+    clock.now = 10
+    assert breaker.state == "half_open"
+    assert asyncio.run(client.parse("brighter")) == {}
+    assert len(model.prompts) == 3
+    assert breaker.state == "open"
+
+    # Next trial succeeds and closes the circuit
+    clock.now = 20
+    model.fail = False
+    assert asyncio.run(client.parse("brighter")) == {"brightness": 10}
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_only_one_trial_through():
+    clock = Clock()
+    breaker = CircuitBreaker(threshold=1, cooldown=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 5
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_sync_wrapper_uses_the_shared_client():
+    model = StubModel(reply={"warmth": 80})
+    set_client(GeminiClient(model=model))
+    try:
+        assert parse_image_edit("warmer") == {"warmth": 50}
+    finally:
+        set_client(None)
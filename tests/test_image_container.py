@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+from ai.image_container import Frame
+
+
+def test_failed_mutate_still_drops_cached_views():
+    frame = Frame(np.zeros((4, 4, 3), dtype=np.uint8))
+    version = frame.version
+    assert frame.rgb().max() == 0
+
+    with pytest.raises(RuntimeError):
+        with frame.mutate() as pixels:
+            pixels[:] = 255
+            raise RuntimeError("edit failed half way")
+
+    assert frame.version != version
+    assert frame.rgb().min() == 255
@@ -0,0 +1,14 @@
+import numpy as np
+
+from ai.image_quality import apply_warmth
+
+
+def test_warmth_saturates_instead_of_wrapping():
+    img = np.full((4, 4, 3), (10, 128, 250), dtype=np.uint8)
+
+    warm = apply_warmth(img, 20)
+    assert warm[0, 0].tolist() == [0, 128, 255]
+
+    cool = apply_warmth(img, -20)
+    assert cool[0, 0].tolist() == [30, 128, 230]
+    assert cool.dtype == np.uint8
@@ -0,0 +1,99 @@
+import os
+import time
+
+import pytest
+
+from ai.job_queue import JobQueue
+
+LEASE = 0.05
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path), lease_seconds=LEASE, max_attempts=2)
+
+
+def expire():
+    time.sleep(LEASE * 2)
+
+
+def test_identical_submits_share_a_job(queue):
+    first = queue.submit(b"photo", {"smile": 6})
+    assert queue.submit(b"photo", {"smile": 6}) == first
+    assert queue.submit(b"photo", {"smile": 7}) != first
+    assert queue.submit(b"photo", {"smile": 6}, version="2") != first
+    assert queue.stats() == {"queued": 3}
+
+
+def test_expired_lease_is_claimed_again(queue):
+    job_id = queue.submit(b"photo", {})
+    assert queue.claim("w1")["id"] == job_id
+    assert queue.claim("w2") is None  # still leased
+
+    expire()
+    job = queue.claim("w2")
+    assert job["id"] == job_id
+    assert job["lease_owner"] == "w2"
+    assert job["attempts"] == 2
+
+    # The first worker lost it: no heartbeat, no result
+    assert not queue.heartbeat(job_id, "w1")
+    assert not queue.complete(job_id, "w1", b"late")
+    assert queue.complete(job_id, "w2", b"out", {"faces": 1})
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert queue.read_output(job) == b"out"
+
+
+def test_job_fails_after_max_attempts(queue):
+    job_id = queue.submit(b"photo", {})
+    for worker in ("w1", "w2"):
+        assert queue.claim(worker)["id"] == job_id
+        expire()
+    assert queue.claim("w3") is None
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert "worker lost 2" in job["error"]
+
+
+def test_resubmitting_a_failed_job_resets_attempts(queue):
+    job_id = queue.submit(b"photo", {})
+    for worker in ("w1", "w2"):
+        queue.claim(worker)
+        queue.fail(job_id, worker, "boom")
+    assert queue.get(job_id)["status"] == "failed"
+
+    assert queue.submit(b"photo", {}) == job_id
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == ("queued", 0, None)
+
+
+def test_done_job_with_missing_output_is_rerun(queue):
+    job_id = queue.submit(b"photo", {})
+    queue.claim("w1")
+    queue.complete(job_id, "w1", b"out")
+    os.remove(queue.get(job_id)["output_path"])
+
+    assert queue.submit(b"photo", {}) == job_id
+    assert queue.get(job_id)["status"] == "queued"
+
+
+def test_prune_removes_old_finished_jobs_and_their_files(queue):
+    done = queue.submit(b"shared", {"smile": 1})
+    queue.claim("w1")
+    queue.complete(done, "w1", b"out")
+    pending = queue.submit(b"shared", {"smile": 2})
+    old = queue.get(done)
+
+    assert queue.prune() == 0  # within retention
+    assert queue.prune(max_age=0) == 1
+    assert queue.get(done) is None
+    assert not os.path.exists(old["output_path"])
+    # Still used by the queued job
+    assert os.path.exists(old["input_path"])
+
+    queue.claim("w1")
+    queue.complete(pending, "w1", b"out")
+    assert queue.prune(max_age=0) == 1
+    assert os.listdir(os.path.join(queue.dir, "inputs")) == []
+    assert os.listdir(os.path.join(queue.dir, "outputs")) == []
@@ -0,0 +1,60 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import ai.landmark_backends as lb
+from ai.landmark_backends import FaceMeshBackend, LandmarkBackend, benchmark_backends, studio_backend
+
+
+class Broken(LandmarkBackend):
+    name = "test_broken"
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def detect(self, image):
+        raise RuntimeError("model exploded")
+
+
+class Fixed(LandmarkBackend):
+    name = "test_fixed"
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def detect(self, image):
+        return []
+
+
+@pytest.fixture
+def fake_backends():
+    lb.register_backend(Broken)
+    lb.register_backend(Fixed)
+    yield
+    for name in ("test_broken", "test_fixed"):
+        lb._BACKENDS.pop(name, None)
+        lb._instances.pop(name, None)
+        lb._measured_ms.pop(name, None)
+
+
+def test_benchmark_survives_a_failing_backend(fake_backends):
+    images = [np.zeros((32, 32, 3), np.uint8)]
+    report = benchmark_backends(images, reference="test_fixed", backends=["test_broken", "test_fixed"])
+    assert "model exploded" in report["test_broken"]["error"]
+    assert report["test_fixed"]["faces"] == 0
+    assert "error" not in report["test_fixed"]
+
+
+def test_studio_backend_rejects_other_layouts(monkeypatch):
+    monkeypatch.setenv("PP_LANDMARK_BACKEND", "dlib68")
+    with pytest.raises(ValueError):
+        studio_backend()
+
+
+def test_face_mesh_unavailable_without_solutions(monkeypatch):
+    monkeypatch.setitem(sys.modules, "mediapipe", types.ModuleType("mediapipe"))
+    assert not FaceMeshBackend.available()
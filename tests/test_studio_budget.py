@@ -0,0 +1,40 @@
+import os
+import time
+
+import cv2
+import pytest
+
+from ai import studio
+from ai.cache import TieredCache
+
+GROUP = os.path.join(os.path.dirname(__file__), "..", "test_images", "group.jpg")
+
+
+@pytest.fixture(scope="module")
+def group_photo():
+    try:
+        studio.landmark_backend()
+    except ValueError as e:
+        pytest.skip(f"no landmark model: {e}")
+    image = cv2.imread(GROUP)
+    if image is None:
+        pytest.skip("test_images/group.jpg missing")
+    # Model loading isn't part of any request's budget
+    studio.enhance_image(image, 6, 1.0)
+    return image
+
+
+@pytest.fixture
+def cold_graph(tmp_path, monkeypatch):
+    """No memoized or stored stage outputs: every run pays for every stage."""
+    monkeypatch.setattr(studio, "_stage_cache", TieredCache(str(tmp_path), namespace="test"))
+    monkeypatch.setattr(studio, "_studio_graph", None)
+
+
+@pytest.mark.parametrize("budget_ms", [50, 150, 400, 2000])
+def test_enhance_stays_within_budget(group_photo, cold_graph, budget_ms):
+    start = time.perf_counter()
+    result, _ = studio.enhance_image(group_photo, 6, 1.0, budget_ms=budget_ms)
+    elapsed = (time.perf_counter() - start) * 1000
+    over = any(d.startswith("over budget") for d in result.degradations)
+    assert elapsed <= budget_ms or over, f"{elapsed:.0f} ms > {budget_ms} ms, {result.degradations}"
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from ai import studio
+from ai.cache import TieredCache, image_hash
+from ai.patches import PatchedImage
+
+
+@pytest.fixture
+def result_cache(tmp_path, monkeypatch):
+    cache = TieredCache(str(tmp_path), namespace="test")
+    monkeypatch.setattr(studio, "_result_cache", cache)
+    return cache
+
+
+def test_frame_is_hashed_once_per_miss(result_cache, monkeypatch):
+    hashed = []
+
+    def counting_hash(image):
+        hashed.append(image.shape)
+        return image_hash(image)
+    monkeypatch.setattr(studio, "image_hash", counting_hash)
+
+    seen = {}
+
+    def compute(image, smile, gaze, budget_ms=None, image_key=None):
+        seen["image_key"] = image_key
+        return PatchedImage(image), []
+
+    image = np.arange(48, dtype=np.uint8).reshape(4, 4, 3)
+    _, _, hit = studio.enhance_cached(image, 6, 1.0, compute=compute)
+    assert not hit
+    assert len(hashed) == 1
+    assert seen["image_key"] == image_hash(image)
+
+    _, _, hit = studio.enhance_cached(image, 6, 1.0, compute=compute)
+    assert hit
@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+from ai import worker_pool
+from ai.worker_pool import EnhanceJob
+
+
+def shm_segments():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+@pytest.fixture
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(worker_pool, "NUM_WORKERS", 1)
+    monkeypatch.setattr(worker_pool, "_pool", None)
+    yield
+    if worker_pool._pool is not None:
+        worker_pool._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def test_pool_recovers_after_a_worker_dies(fresh_pool):
+    with pytest.raises(BrokenProcessPool):
+        worker_pool.submit(os._exit, 1).result(timeout=60)
+    # Before the fix every later submit raised BrokenProcessPool
+    assert worker_pool.submit(worker_pool._ping).result(timeout=60) > 0
+
+
+class FailingPool:
+    def submit(self, *args):
+        raise RuntimeError("pool is shutting down")
+
+
+def test_segment_is_unlinked_when_submit_fails():
+    before = shm_segments()
+    with pytest.raises(RuntimeError):
+        EnhanceJob(np.zeros((8, 8, 3), np.uint8), 6, 1.0, pool=FailingPool())
+    assert shm_segments() == before
+
+
+def test_job_is_resubmitted_once_after_a_worker_death(monkeypatch):
+    calls = []
+
+    def fake_submit(fn, *args):
+        calls.append(args)
+        future = Future()
+        if len(calls) == 1:
+            future.set_exception(BrokenProcessPool("worker died"))
+        else:
+            future.set_result(([], [], {}, []))
+        return future
+    monkeypatch.setattr(worker_pool, "submit", fake_submit)
+
+    before = shm_segments()
+    job = EnhanceJob(np.zeros((8, 8, 3), np.uint8), 6, 1.0)
+    result, faces = job.result(timeout=5)
+    assert len(calls) == 2
+    assert job.done() and faces == [] and result.patches == []
+    assert shm_segments() == before
+
+
+def test_repeated_worker_deaths_fail_the_job(monkeypatch):
+    def fake_submit(fn, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker died"))
+        return future
+    monkeypatch.setattr(worker_pool, "submit", fake_submit)
+
+    job = EnhanceJob(np.zeros((8, 8, 3), np.uint8), 6, 1.0)
+    with pytest.raises(BrokenProcessPool):
+        job.result(timeout=5)